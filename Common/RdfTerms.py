@@ -0,0 +1,19 @@
+import re
+
+LOCAL_NAME = re.compile(r'^[A-Za-z0-9_]([A-Za-z0-9_\-]*[A-Za-z0-9_])?$')
+
+
+def sorted_namespaces(namespaces: dict) -> [(str, str)]:
+    # longest namespace first, so the most specific prefix wins
+    return sorted(((prefix, str(namespace)) for prefix, namespace in namespaces.items()), key=lambda item: -len(item[1]))
+
+
+def escape_literal(lexical: str) -> str:
+    return lexical.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+
+
+def compact_iri(namespaces: [(str, str)], iri: str) -> str:
+    for prefix, namespace in namespaces:
+        if iri.startswith(namespace) and LOCAL_NAME.match(iri[len(namespace):]):
+            return f'{prefix}:{iri[len(namespace):]}'
+    return None
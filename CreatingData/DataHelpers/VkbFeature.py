@@ -19,3 +19,4 @@ class VkbFeature:
     beheerder_code: str = ''
     beheerder_naam: str = ''
     wegsegment_ids: [str] = None
+    wgs84_coords: tuple = None  # (lat, long), filled in by VkbFeatureToOSLOProcessor.transform_coords
@@ -0,0 +1,69 @@
+from rdflib import BNode, Literal, RDF, XSD
+
+from Common.RdfTerms import sorted_namespaces, compact_iri, escape_literal
+
+
+class NTriplesWriter:
+    # a sink for VkbFeatureToOSLOProcessor that writes every triple to output as soon as it is added
+    def __init__(self, output):
+        self.output = output
+        self.count = 0
+
+    def add(self, triple: tuple) -> None:
+        s, p, o = triple
+        self.output.write(f'{self._term(s)} {self._term(p)} {self._term(o)} .\n')
+        self.count += 1
+
+    def close(self) -> None:
+        pass
+
+    def _term(self, term) -> str:
+        if isinstance(term, Literal):
+            lexical = escape_literal(str(term))
+            if term.language is not None:
+                return f'"{lexical}"@{term.language}'
+            if term.datatype is not None and term.datatype != XSD.string:
+                return f'"{lexical}"^^{self._term(term.datatype)}'
+            return f'"{lexical}"'
+        if isinstance(term, BNode):
+            return f'_:{term}'
+        return self._iri(term)
+
+    def _iri(self, iri) -> str:
+        return f'<{iri}>'
+
+
+class TurtleWriter(NTriplesWriter):
+    # groups the triples that are added one after the other for the same subject, only that subject is kept open
+    def __init__(self, output, namespaces: dict):
+        super().__init__(output)
+        self.namespaces = sorted_namespaces(namespaces)
+        self._subject = None
+
+    def write_prefixes(self) -> None:
+        self.output.write(''.join(f'@prefix {prefix}: <{namespace}> .\n'
+                                  for prefix, namespace in sorted(self.namespaces)) + '\n')
+
+    def add(self, triple: tuple) -> None:
+        s, p, o = triple
+        if s == self._subject:
+            self.output.write(f' ;\n    {self._predicate(p)} {self._term(o)}')
+        else:
+            if self._subject is not None:
+                self.output.write(' .\n\n')
+            self.output.write(f'{self._term(s)} {self._predicate(p)} {self._term(o)}')
+            self._subject = s
+        self.count += 1
+
+    def close(self) -> None:
+        if self._subject is not None:
+            self.output.write(' .\n\n')
+            self._subject = None
+
+    def _predicate(self, predicate) -> str:
+        return 'a' if predicate == RDF.type else self._term(predicate)
+
+    def _iri(self, iri) -> str:
+        compacted = compact_iri(self.namespaces, iri)
+        return compacted if compacted is not None else f'<{iri}>'
+
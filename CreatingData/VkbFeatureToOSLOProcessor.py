@@ -1,3 +1,4 @@
+from array import array
 from pathlib import Path
 
 from rdflib import Graph, RDF, URIRef, Literal, BNode, XSD, Namespace
@@ -6,21 +7,30 @@ from pyproj import CRS, Transformer
 from CreatingData.DataHelpers.VkbFeature import VkbFeature
 
 
+NAMESPACES = {
+    'mob': 'https://data.vlaanderen.be/ns/mobiliteit#',
+    'vkb': 'https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/',
+    'asset': 'https://data.awvvlaanderen.be/id/asset/',
+    'wr': 'https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/',
+    'orgvl': 'https://data.vlaanderen.be/doc/organisatie/',
+    'od': 'https://data.vlaanderen.be/ns/openbaardomein#',
+    'geo': 'http://www.w3.org/2003/01/geo/wgs84_pos#',
+    'loc': 'http://www.w3.org/ns/locn#',
+    'skos': 'http://www.w3.org/2004/02/skos/core#',
+    'weg': 'https://data.vlaanderen.be/ns/weg#',
+    'org': 'http://www.w3.org/ns/org#'
+}
+
+
 class VkbFeatureToOSLOProcessor:
-    def __init__(self):
-        self.graph = Graph()
-        self.graph.bind('mob', Namespace('https://data.vlaanderen.be/ns/mobiliteit#'))
-        self.graph.bind('vkb', Namespace('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/'))
-        self.graph.bind('asset', Namespace('https://data.awvvlaanderen.be/id/asset/'))
-        self.graph.bind('wr',
-                        Namespace('https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/'))
-        self.graph.bind('orgvl', 'https://data.vlaanderen.be/doc/organisatie/')
-        self.graph.bind('od', 'https://data.vlaanderen.be/ns/openbaardomein#')
-        self.graph.bind('geo', 'http://www.w3.org/2003/01/geo/wgs84_pos#')
-        self.graph.bind('loc', 'http://www.w3.org/ns/locn#')
-        self.graph.bind('skos', 'http://www.w3.org/2004/02/skos/core#')
-        self.graph.bind('weg', 'https://data.vlaanderen.be/ns/weg#')
-        self.graph.bind('org', 'http://www.w3.org/ns/org#')
+    def __init__(self, sink=None):
+        # the triples are added to sink, e.g. a TripleWriter that writes them right away, or to a new Graph
+        if sink is None:
+            self.graph = Graph()
+            for prefix, namespace in NAMESPACES.items():
+                self.graph.bind(prefix, Namespace(namespace))
+        else:
+            self.graph = sink
 
         self.load_beheerders()
 
@@ -28,6 +38,19 @@ class VkbFeatureToOSLOProcessor:
         crs_wgs = CRS.from_epsg(4326)
         self.transformer = Transformer.from_crs(crs_lambert72, crs_wgs)
 
+    def transform_coords(self, features: [VkbFeature]) -> None:
+        # one pyproj call for the whole batch, the per call overhead is much larger than the transformation itself
+        xs = array('d', (feature.coords[0] for feature in features))
+        ys = array('d', (feature.coords[1] for feature in features))
+        lats, longs = self.transformer.transform(xs, ys)
+        for feature, lat, long in zip(features, lats, longs):
+            feature.wgs84_coords = (lat, long)
+
+    def process_batch_to_oslo(self, features: [VkbFeature]) -> None:
+        self.transform_coords(features)
+        for feature in features:
+            self.process_to_oslo(feature)
+
     def process_to_oslo(self, feature: VkbFeature) -> None:
 
         opstelling_ref = URIRef(f'https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/{feature.id}')
@@ -36,7 +59,9 @@ class VkbFeatureToOSLOProcessor:
 
         # geometrie van de opstelling
         # wgs84_pos.rdf
-        coords = self.transformer.transform(feature.coords[0], feature.coords[1])
+        coords = feature.wgs84_coords
+        if coords is None:
+            coords = self.transformer.transform(feature.coords[0], feature.coords[1])
         geo_ref = BNode()
         self.graph.add((opstelling_ref, URIRef('http://www.w3.org/ns/locn#geometry'), geo_ref))
         self.graph.add((geo_ref, RDF.type, URIRef('http://www.w3.org/2003/01/geo/wgs84_pos#Point')))
@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+from typing import Generator, Iterable
+
+
+class VkbJsonReader:
+    # reads the features of an export one json object at a time instead of loading the whole file
+    # .ndjson and .jsonl files hold one feature per line, every other file holds one top level json array
+    def __init__(self, buffer_size: int = 1 << 16):
+        self.buffer_size = buffer_size
+        self.decoder = json.JSONDecoder()
+
+    def read(self, file_path) -> Generator[dict, None, None]:
+        with open(file_path, encoding='utf-8') as f:
+            if Path(file_path).suffix in ('.ndjson', '.jsonl'):
+                yield from self.read_lines(f)
+            else:
+                yield from self.read_array(f)
+
+    def read_batches(self, file_path, batch_size: int) -> Generator[list, None, None]:
+        yield from batched(self.read(file_path), batch_size)
+
+    @staticmethod
+    def read_lines(f) -> Generator[dict, None, None]:
+        for line in f:
+            if line.strip() != '':
+                yield json.loads(line)
+
+    def read_array(self, f) -> Generator[dict, None, None]:
+        # expected is what has to come next: '[', 'feature or ]' right after the '[', ', or ]' after a feature
+        # and 'feature' after a ','. only the unread part of the buffer is kept when more is read
+        buffer, position, end_of_file = '', 0, False
+        expected = '['
+        while True:
+            position = self._skip_whitespace(buffer, position)
+            if position >= len(buffer):
+                if end_of_file:
+                    if expected == '[':
+                        raise ValueError('the export should be a json array of features')
+                    raise ValueError('the export ends in the middle of the array')
+                buffer, position, end_of_file = self._read_more(f, buffer, position)
+                continue
+
+            char = buffer[position]
+            if expected == '[':
+                if char != '[':
+                    raise ValueError('the export should be a json array of features')
+                position, expected = position + 1, 'feature or ]'
+                continue
+            if char == ']':
+                if expected == 'feature':
+                    raise ValueError('the array has a trailing comma before its ]')
+                return
+            if expected == ', or ]':
+                if char != ',':
+                    raise ValueError(f'expected , or ] instead of {char}')
+                position, expected = position + 1, 'feature'
+                continue
+            if char == ',':
+                raise ValueError('expected a feature instead of ,')
+
+            try:
+                feature, end = self.decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                if end_of_file:
+                    if exc.pos >= len(buffer):
+                        raise ValueError('the export ends in the middle of the array')
+                    raise ValueError(f'the export is not valid json: {exc}')
+                # the next feature is not complete yet
+                buffer, position, end_of_file = self._read_more(f, buffer, position)
+                continue
+            if end >= len(buffer) and not end_of_file:
+                # a value that ends with the buffer, like a number, could go on in the next read
+                buffer, position, end_of_file = self._read_more(f, buffer, position)
+                continue
+            position, expected = end, ', or ]'
+            yield feature
+
+    def _read_more(self, f, buffer: str, position: int) -> (str, int, bool):
+        more = f.read(max(self.buffer_size, len(buffer) - position))
+        return buffer[position:] + more, 0, more == ''
+
+    @staticmethod
+    def _skip_whitespace(buffer: str, position: int) -> int:
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        return position
+
+
+def batched(items: Iterable, batch_size: int) -> Generator[list, None, None]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
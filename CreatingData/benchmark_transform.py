@@ -0,0 +1,49 @@
+import random
+import time
+
+from rdflib import Graph
+
+from CreatingData.DataHelpers.VkbFeature import VkbFeature
+from CreatingData.VkbFeatureToOSLOProcessor import VkbFeatureToOSLOProcessor
+from CreatingData.VkbJsonReader import batched
+
+
+def synthetic_features(count: int, seed: int = 1) -> [VkbFeature]:
+    # random points in the Lambert72 bounding box of Flanders
+    random.seed(seed)
+    return [VkbFeature(id=i, coords=[random.uniform(22000, 258000), random.uniform(153000, 244000)], borden=[],
+                       wegsegment_ids=[]) for i in range(count)]
+
+
+def timed(name: str, count: int, fn) -> float:
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    print(f'{name:<40} {round(seconds, 3):>8} s {round(count / seconds):>10} features/s')
+    return seconds
+
+
+def benchmark(count: int = 30000, batch_size: int = 250) -> None:
+    processor = VkbFeatureToOSLOProcessor()
+    features = synthetic_features(count)
+    batches = list(batched(features, batch_size))
+
+    scalar = timed('transform per feature', count,
+                   lambda: [processor.transformer.transform(f.coords[0], f.coords[1]) for f in features])
+    vectorized = timed(f'transform per batch of {batch_size}', count,
+                       lambda: [processor.transform_coords(batch) for batch in batches])
+    print(f'transform speedup: {round(scalar / vectorized, 1)}x')
+
+    processor.graph = Graph()
+    features = synthetic_features(count)
+    scalar = timed('process_to_oslo per feature', count, lambda: [processor.process_to_oslo(f) for f in features])
+    processor.graph = Graph()
+    batches = list(batched(synthetic_features(count), batch_size))
+    vectorized = timed(f'process_batch_to_oslo per batch of {batch_size}', count,
+                       lambda: [processor.process_batch_to_oslo(batch) for batch in batches])
+    print(f'conversion speedup: {round(scalar / vectorized, 2)}x')
+
+
+if __name__ == '__main__':
+    # run from the CreatingData directory, like main.py: python benchmark_transform.py
+    benchmark()
@@ -1,50 +1,203 @@
 import concurrent.futures
+import hashlib
+import io
 import json
 import os
+import shutil
 import time
+from collections import deque
 from pathlib import Path
 
 from termcolor import colored
 
+from Common.Files import file_sha256
 from CreatingData.JsonToVkbFeatureProcessor import JsonToVkbFeatureProcessor
-from CreatingData.VkbFeatureToOSLOProcessor import VkbFeatureToOSLOProcessor
+from CreatingData.TripleWriter import NTriplesWriter, TurtleWriter
+from CreatingData.VkbFeatureToOSLOProcessor import VkbFeatureToOSLOProcessor, NAMESPACES
+from CreatingData.VkbJsonReader import VkbJsonReader
 
+# set in every worker process by init_worker, so the beheerders and the pyproj transformer are loaded once per worker
+to_feature_processor: JsonToVkbFeatureProcessor = None
+to_oslo_processor: VkbFeatureToOSLOProcessor = None
 
-def load_file_into_graph(file_path, graph):
-    with open(file_path, encoding='utf-8') as f:
-        data_list = json.load(f)
-    features = []
 
-    # use multithreading
-    start = time.time()
+output_format: str = 'nt'
+
+
+def init_worker(format: str = 'nt') -> None:
+    global to_feature_processor, to_oslo_processor, output_format
     to_feature_processor = JsonToVkbFeatureProcessor()
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        results = [executor.submit(to_feature_processor.process_json_object, dict_list=dict_list) for dict_list in
-                   data_list]
-        for f in concurrent.futures.as_completed(results):
-            features.append(f.result())
+    to_oslo_processor = VkbFeatureToOSLOProcessor(sink=NTriplesWriter(None))
+    output_format = format
+
+
+def create_writer(output, format: str):
+    if format == 'nt':
+        return NTriplesWriter(output)
+    if format == 'turtle':
+        return TurtleWriter(output, NAMESPACES)
+    raise ValueError(f'unsupported format {format}, use nt or turtle')
+
+
+def convert_chunk(dict_lists: [dict]) -> (str, [str]):
+    # runs in a worker: json objects in, N-Triples lines or Turtle statements and the opstelling uris out
+    # the triples are written while they are created, no Graph is built for the chunk
+    output = io.StringIO()
+    to_oslo_processor.graph = create_writer(output, output_format)
+    features = [to_feature_processor.process_json_object(dict_list) for dict_list in dict_lists]
+    to_oslo_processor.process_batch_to_oslo(features)
+    to_oslo_processor.graph.close()
+    return output.getvalue(), [NAMESPACES['vkb'] + str(feature.id) for feature in features]
+
+
+def convert_file(executor, max_workers: int, file_path: Path, output, chunk_size: int) -> [str]:
+    # the exports are read one feature at a time and at most two chunks per worker are in flight,
+    # so the memory use depends on chunk_size and not on the size of the exports
+    reader = VkbJsonReader()
+    in_flight = deque()
+    opstellingen = []
+
+    def write_next():
+        text, uris = in_flight.popleft().result()
+        output.write(text)
+        opstellingen.extend(uris)
+
+    for chunk in reader.read_batches(file_path, chunk_size):
+        if len(in_flight) >= 2 * max_workers:
+            write_next()
+        in_flight.append(executor.submit(convert_chunk, chunk))
+    while len(in_flight) > 0:
+        write_next()
+    print(colored(f'Read {len(opstellingen)} features of {file_path}', 'green'))
+    return opstellingen
+
+
+def convert_files(file_paths: [Path], output_path, chunk_size: int = 250, max_workers: int = None,
+                  format: str = 'nt') -> None:
+    # the workers convert chunks of features, the parent writes their output in order
+    # N-Triples is valid Turtle, so both formats load in the TripleStore as a .ttl file
+    # with format turtle the parent writes the prefixes once and the chunks use them
+    start = time.time()
+    max_workers = max_workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                                initargs=(format,)) as executor, \
+            open(output_path, 'w', encoding='utf-8') as output:
+        writer = create_writer(output, format)
+        if isinstance(writer, TurtleWriter):
+            writer.write_prefixes()
+        for file_path in file_paths:
+            convert_file(executor, max_workers, file_path, output, chunk_size)
     end = time.time()
-    print(colored(f'Processed to vkb features: {len(features)} in {round(end - start, 2)} seconds', 'green'))
+    print(colored(f'Written {output_path} in {round(end - start, 2)} seconds', 'green'))
+
+
+def load_manifest(manifest_path: Path, format: str) -> dict:
+    # a manifest written for another format can't be reused, every file is converted again
+    # and the fragments of the other format are deleted
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != format:
+        for entry in manifest['files'].values():
+            (manifest_path.parent / entry['fragment']).unlink(missing_ok=True)
+        return {}
+    return manifest['files']
+
 
+def convert_files_incremental(file_paths: [Path], output_path, parts_dir=None, chunk_size: int = 250,
+                              max_workers: int = None, format: str = 'nt') -> dict:
+    # every export is converted into its own fragment in parts_dir, the manifest keeps the sha256 of the export
+    # and the opstellingen of its fragment. only the exports that changed since the previous run are converted,
+    # the fragments of removed exports are deleted and the output is put together again from the fragments
     start = time.time()
+    parts_dir = Path(parts_dir or f'{output_path}.parts')
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = parts_dir / 'manifest.json'
+    previous = load_manifest(manifest_path, format)
+    suffix = '.nt' if format == 'nt' else '.ttl'
+    create_writer(io.StringIO(), format)  # fails before any work on an unsupported format
+
+    files, changed = {}, []
+    for file_path in file_paths:
+        key = str(file_path)
+        sha256 = file_sha256(file_path)
+        entry = previous.get(key)
+        if entry is not None and entry['sha256'] == sha256 and (parts_dir / entry['fragment']).exists():
+            files[key] = entry
+        else:
+            fragment = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16] + suffix
+            files[key] = {'sha256': sha256, 'fragment': fragment, 'opstellingen': []}
+            changed.append(file_path)
+    removed = [key for key in previous if key not in files]
+
+    if len(changed) > 0:
+        max_workers = max_workers or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                                                    initargs=(format,)) as executor:
+            for file_path in changed:
+                entry = files[str(file_path)]
+                fragment_path = parts_dir / entry['fragment']
+                with open(fragment_path.with_suffix('.tmp'), 'w', encoding='utf-8') as output:
+                    entry['opstellingen'] = convert_file(executor, max_workers, file_path, output, chunk_size)
+                os.replace(fragment_path.with_suffix('.tmp'), fragment_path)
+    for key in removed:
+        (parts_dir / previous[key]['fragment']).unlink(missing_ok=True)
+
+    before = {uri for entry in previous.values() for uri in entry['opstellingen']}
+    after = {uri for entry in files.values() for uri in entry['opstellingen']}
+    summary = {'converted': [str(file_path) for file_path in changed], 'removed': removed,
+               'unchanged': len(files) - len(changed), 'added_opstellingen': len(after - before),
+               'removed_opstellingen': len(before - after)}
 
+    if len(changed) > 0 or len(removed) > 0 or not Path(output_path).exists():
+        # the output is written next to the old one and replaces it in one step, the manifest is only
+        # written afterwards so an interrupted run converts the same exports again
+        tmp_path = f'{output_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as output:
+            writer = create_writer(output, format)
+            if isinstance(writer, TurtleWriter):
+                writer.write_prefixes()
+            for entry in files.values():
+                with open(parts_dir / entry['fragment'], encoding='utf-8') as fragment:
+                    shutil.copyfileobj(fragment, output)
+        os.replace(tmp_path, output_path)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': format, 'files': files}, f)
+        # fragments that no export refers to anymore, e.g. left behind by an interrupted run
+        fragments = {entry['fragment'] for entry in files.values()}
+        for path in parts_dir.iterdir():
+            if path.suffix in ('.nt', '.ttl', '.tmp') and path.name not in fragments:
+                path.unlink()
+
+    end = time.time()
+    print(colored(f'Converted {len(changed)} of {len(files)} files, removed {len(removed)}, '
+                  f'+{summary["added_opstellingen"]} -{summary["removed_opstellingen"]} opstellingen, '
+                  f'written {output_path} in {round(end - start, 2)} seconds', 'green'))
+    return summary
+
+
+def load_file_into_graph(file_path, graph):
+    start = time.time()
+    to_feature_processor = JsonToVkbFeatureProcessor()
     to_oslo_processor = VkbFeatureToOSLOProcessor()
     if graph is None:
         graph = to_oslo_processor.graph
     else:
         to_oslo_processor.graph = graph
 
-    for feature in features:
-        to_oslo_processor.process_to_oslo(feature)
+    count = 0
+    for dict_lists in VkbJsonReader().read_batches(file_path, 250):
+        to_oslo_processor.process_batch_to_oslo([to_feature_processor.process_json_object(dict_list)
+                                                 for dict_list in dict_lists])
+        count += len(dict_lists)
     end = time.time()
-    print(colored(f'Processed vkb features to graph in {round(end - start, 2)} seconds', 'green'))
+    print(colored(f'Processed {count} vkb features to graph in {round(end - start, 2)} seconds', 'green'))
 
     return graph
 
 
 if __name__ == '__main__':
-    graph = None
+    # only the exports that changed since the previous run are converted again, see vkb_oslo_30k.ttl.parts
     directory = Path('Data')
-    for filename in os.listdir(directory):
-        graph = load_file_into_graph(file_path=os.path.join(directory, filename), graph=graph)
-    graph.serialize('vkb_oslo_30k.ttl')
+    convert_files_incremental(sorted(directory / filename for filename in os.listdir(directory)), 'vkb_oslo_30k.ttl')
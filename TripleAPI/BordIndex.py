@@ -0,0 +1,96 @@
+from typing import Generator
+
+from rdflib import Graph, URIRef
+
+OMVAT_VERKEERSBORD = URIRef('https://data.vlaanderen.be/ns/mobiliteit#omvatVerkeersbord')
+REALISEERT = URIRef('https://data.vlaanderen.be/ns/mobiliteit#realiseert')
+HEEFT_VERKEERSBORDCONCEPT = URIRef('https://data.vlaanderen.be/ns/mobiliteit#heeftVerkeersbordconcept')
+PREF_LABEL = URIRef('http://www.w3.org/2004/02/skos/core#prefLabel')
+BEHEERDER = URIRef('https://data.vlaanderen.be/ns/openbaardomein#beheerder')
+ORGANISATIE = 'https://data.vlaanderen.be/doc/organisatie/'
+# Verkeersbord -> Verkeersteken -> Verkeersbordconcept
+BORD_RELATIONS = [REALISEERT, HEEFT_VERKEERSBORDCONCEPT]
+
+
+class BordIndex:
+    # bord code -> borden, beheerder -> borden and bord -> opstelling, built once when the graph is loaded
+    # the bord code is the skos:prefLabel of the concept of the bord, the beheerder the OVO code of the organisation
+    def __init__(self):
+        self._code: dict = {}
+        self._beheerder: dict = {}
+        self._opstelling: dict = {}
+        self._by_code: dict = {}
+        self._by_beheerder: dict = {}
+
+    def __len__(self):
+        return len(self._opstelling)
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> 'BordIndex':
+        index = cls()
+        bord_of_teken = {teken: bord for bord, teken in graph.subject_objects(predicate=REALISEERT)}
+        code_of_concept = {concept: str(label) for concept, label in graph.subject_objects(predicate=PREF_LABEL)}
+        codes = []
+        for teken, concept in graph.subject_objects(predicate=HEEFT_VERKEERSBORDCONCEPT):
+            bord = bord_of_teken.get(teken)
+            code = code_of_concept.get(concept)
+            if bord is not None and code is not None:
+                codes.append((bord, code))
+        beheerders = [(bord, str(organisatie).removeprefix(ORGANISATIE))
+                      for bord, organisatie in graph.subject_objects(predicate=BEHEERDER)]
+        index.build(graph.subject_objects(predicate=OMVAT_VERKEERSBORD), codes, beheerders)
+        return index
+
+    def build(self, opstelling_borden, codes, beheerders) -> None:
+        # pairs of (opstelling, bord), (bord, code) and (bord, beheerder)
+        self._opstelling = {bord: opstelling for opstelling, bord in opstelling_borden}
+        self._code, self._by_code = self._pairs(codes)
+        self._beheerder, self._by_beheerder = self._pairs(beheerders)
+
+    @staticmethod
+    def _pairs(pairs) -> (dict, dict):
+        forward, inverse = {}, {}
+        for bord, value in pairs:
+            forward[bord] = value
+            inverse.setdefault(value, {})[bord] = None
+        return forward, {value: tuple(borden) for value, borden in inverse.items()}
+
+    def code(self, bord: URIRef) -> str:
+        return self._code.get(bord)
+
+    def beheerder(self, bord: URIRef) -> str:
+        return self._beheerder.get(bord)
+
+    def opstelling(self, bord: URIRef) -> URIRef:
+        return self._opstelling.get(bord)
+
+    def borden(self, code: str = None, beheerder: str = None, opstellingen: set = None) -> Generator[URIRef, None, None]:
+        # the borden that match every given filter, starting from the shortest list of the code and the beheerder
+        # opstellingen limits the borden to those opstellingen, e.g. the ones in a bounding box
+        if code is None and beheerder is None:
+            raise ValueError('borden are looked up by code, beheerder or both')
+        return self._borden(code, beheerder, opstellingen)
+
+    def _borden(self, code: str, beheerder: str, opstellingen: set) -> Generator[URIRef, None, None]:
+        candidates = []
+        if code is not None:
+            candidates.append(self._by_code.get(code, ()))
+        if beheerder is not None:
+            candidates.append(self._by_beheerder.get(beheerder, ()))
+        for bord in min(candidates, key=len):
+            if code is not None and self._code.get(bord) != code:
+                continue
+            if beheerder is not None and self._beheerder.get(bord) != beheerder:
+                continue
+            if opstellingen is not None and self._opstelling.get(bord) not in opstellingen:
+                continue
+            yield bord
+
+    def opstellingen(self, borden) -> Generator[URIRef, None, None]:
+        # the opstelling of every bord, an opstelling with several of the borden is yielded once
+        seen = set()
+        for bord in borden:
+            opstelling = self._opstelling.get(bord)
+            if opstelling is not None and opstelling not in seen:
+                seen.add(opstelling)
+                yield opstelling
@@ -0,0 +1,145 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from rdflib import Graph, URIRef
+from rdflib.store import Store
+
+ORDERS = {'spo': (0, 1, 2), 'pos': (1, 2, 0), 'osp': (2, 0, 1)}
+
+
+class TripleIndex:
+    # one sort order of the triple table, stored as three columns of term ids
+    def __init__(self, order: (int, int, int), columns: tuple):
+        self.order = order
+        self.columns = columns
+
+    @classmethod
+    def sorted_from(cls, order: (int, int, int), triples: [(int, int, int)], typecode: str) -> 'TripleIndex':
+        rows = sorted((t[order[0]], t[order[1]], t[order[2]]) for t in triples)
+        return cls(order, tuple(array(typecode, (row[k] for row in rows)) for k in range(3)))
+
+    def range(self, key: tuple) -> (int, int):
+        lo, hi = 0, len(self.columns[0])
+        for column, value in zip(self.columns, key):
+            lo, hi = bisect_left(column, value, lo, hi), bisect_right(column, value, lo, hi)
+        return lo, hi
+
+    def __len__(self):
+        return len(self.columns[0])
+
+
+class CompactStore(Store):
+    # read-only store that interns every term into an integer id and keeps the triples as sorted
+    # SPO, POS and OSP id columns, every triple pattern becomes a bisection in one of those orders
+    # terms only needs __getitem__ (id -> term) and term_ids only needs get (term -> id), so both
+    # can be plain containers or views on a memory mapped snapshot
+    def __init__(self, terms, term_ids, indexes: {str: TripleIndex}, namespaces: dict = None):
+        super().__init__()
+        self._terms = terms
+        self._term_ids = term_ids
+        self._spo = indexes['spo']
+        self._pos = indexes['pos']
+        self._osp = indexes['osp']
+        self._namespace = {}
+        self._prefix = {}
+        for prefix, namespace in (namespaces or {}).items():
+            self.bind(prefix, URIRef(namespace))
+
+    @classmethod
+    def from_triple_table(cls, terms: list, triple_table, namespaces: dict = None) -> 'CompactStore':
+        typecode = 'i' if len(terms) < 2 ** 31 else 'q'
+        triples = [(triple_table[i], triple_table[i + 1], triple_table[i + 2]) for i in range(0, len(triple_table), 3)]
+        indexes = {name: TripleIndex.sorted_from(order, triples, typecode) for name, order in ORDERS.items()}
+        return cls(terms, {term: term_id for term_id, term in enumerate(terms)}, indexes, namespaces=namespaces)
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> 'CompactStore':
+        terms = []
+        term_ids = {}
+        triple_table = array('q')
+        for triple in graph:
+            for term in triple:
+                term_id = term_ids.get(term)
+                if term_id is None:
+                    term_id = term_ids[term] = len(terms)
+                    terms.append(term)
+                triple_table.append(term_id)
+        return cls.from_triple_table(terms, triple_table,
+                                     namespaces={prefix: namespace for prefix, namespace in graph.namespaces()})
+
+    @property
+    def terms(self):
+        return self._terms
+
+    def term_id(self, term) -> int:
+        return self._term_ids.get(term)
+
+    def triples(self, triple_pattern, context=None):
+        ids = []
+        for term in triple_pattern:
+            if term is None:
+                ids.append(None)
+                continue
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                return
+            ids.append(term_id)
+        s, p, o = ids
+
+        if s is not None:
+            if p is None and o is not None:
+                index, key = self._osp, (o, s)
+            elif p is None:
+                index, key = self._spo, (s,)
+            else:
+                index, key = self._spo, (s, p) if o is None else (s, p, o)
+        elif p is not None:
+            index, key = self._pos, (p,) if o is None else (p, o)
+        elif o is not None:
+            index, key = self._osp, (o,)
+        else:
+            index, key = self._spo, ()
+
+        terms = self._terms
+        first, second, third = index.columns
+        lo, hi = index.range(key)
+        order = index.order
+        triple = [None, None, None]
+        for i in range(lo, hi):
+            triple[order[0]] = terms[first[i]]
+            triple[order[1]] = terms[second[i]]
+            triple[order[2]] = terms[third[i]]
+            yield (triple[0], triple[1], triple[2]), iter(())
+
+    def __len__(self, context=None):
+        return len(self._spo)
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def add(self, triple, context, quoted=False):
+        raise TypeError('CompactStore is read-only')
+
+    def remove(self, triple, context=None):
+        raise TypeError('CompactStore is read-only')
+
+    def bind(self, prefix, namespace, override=True):
+        bound_namespace = self._namespace.get(prefix)
+        bound_prefix = self._prefix.get(namespace)
+        if bound_prefix is not None and not override:
+            return
+        if bound_prefix is not None:
+            del self._namespace[bound_prefix]
+        if bound_namespace is not None:
+            del self._prefix[bound_namespace]
+        self._namespace[prefix] = namespace
+        self._prefix[namespace] = prefix
+
+    def namespace(self, prefix):
+        return self._namespace.get(prefix, None)
+
+    def prefix(self, namespace):
+        return self._prefix.get(namespace, None)
+
+    def namespaces(self):
+        yield from self._namespace.items()
@@ -0,0 +1,278 @@
+import contextlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from functools import lru_cache
+from pathlib import Path
+
+from rdflib import Graph, URIRef, BNode, Literal
+
+from Common.Files import file_sha256
+from TripleAPI.CompactStore import CompactStore, TripleIndex, ORDERS
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, concurrent loaders then each write their own temporary file
+    fcntl = None
+
+MAGIC = b'VKBSNAP1'
+FORMAT_VERSION = 2
+HEADER_ROOM = 32
+
+
+def encode_term(term) -> bytes:
+    if isinstance(term, URIRef):
+        return b'U' + str(term).encode('utf-8')
+    if isinstance(term, BNode):
+        return b'B' + str(term).encode('utf-8')
+    if isinstance(term, Literal):
+        return b'L' + '\x00'.join((str(term), str(term.datatype or ''), term.language or '')).encode('utf-8')
+    raise ValueError(f'can not encode term {term!r}')
+
+
+def decode_term(encoded: bytes):
+    tag, value = encoded[:1], encoded[1:].decode('utf-8')
+    if tag == b'U':
+        return URIRef(value)
+    if tag == b'B':
+        return BNode(value)
+    lexical, datatype, language = value.split('\x00')
+    return Literal(lexical, datatype=URIRef(datatype) if datatype else None, lang=language or None)
+
+
+class MappedTermTable:
+    # term table on top of the sorted term blob of a memory mapped snapshot
+    # terms are decoded on access (with a bounded cache) and looked up by bisection, so no process keeps a full copy
+    def __init__(self, offsets: memoryview, blob: memoryview, cache_size: int = 65536):
+        self._offsets = offsets
+        self._blob = blob
+        self._decode = lru_cache(maxsize=cache_size)(self._decode_term_id)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, term_id: int):
+        return self._decode(term_id)
+
+    def get(self, term, default=None):
+        try:
+            key = encode_term(term)
+        except ValueError:
+            return default
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._encoded(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._encoded(lo) == key:
+            return lo
+        return default
+
+    def _encoded(self, term_id: int) -> bytes:
+        return self._blob[self._offsets[term_id]:self._offsets[term_id + 1]].tobytes()
+
+    def _decode_term_id(self, term_id: int):
+        return decode_term(self._encoded(term_id))
+
+
+class GraphSnapshot:
+    # binary copy of a parsed source: a header, a sorted term table and the SPO, POS and OSP sorted columns of term ids
+    # the snapshot is valid as long as the source keeps its mtime and size, or its sha256 when those changed
+    # every section starts on an 8 byte boundary so the file can be memory mapped and shared between processes
+    def __init__(self, source, snapshot_dir=None):
+        self.source = Path(source)
+        directory = Path(snapshot_dir) if snapshot_dir is not None else self.source.parent
+        self.path = directory / (self.source.name + '.snapshot')
+
+    def is_valid(self) -> bool:
+        header = self.read_header()
+        if header is None:
+            return False
+        stat = self.source.stat()
+        if header['source_mtime_ns'] == stat.st_mtime_ns and header['source_size'] == stat.st_size:
+            return True
+        if header['source_sha256'] != file_sha256(self.source):
+            return False
+        # the source was touched but has the same content, its new stat is kept so the next start does not hash it
+        self.write_source_stat(header, stat)
+        return True
+
+    def write_source_stat(self, header: dict, stat: os.stat_result) -> None:
+        # the header is rewritten in place, it has room for that after the json; the caller holds the lock
+        fields = {key: value for key, value in header.items() if key != 'header_length'}
+        fields.update(source_mtime_ns=stat.st_mtime_ns, source_size=stat.st_size)
+        encoded = json.dumps(fields).encode('utf-8')
+        if len(encoded) > header['header_length']:
+            return
+        with open(self.path, 'r+b') as f:
+            f.seek(len(MAGIC) + 4)
+            f.write(encoded + b' ' * (header['header_length'] - len(encoded)))
+
+    @contextlib.contextmanager
+    def lock(self):
+        # the first process to get the lock becomes the loader, the others wait for its snapshot
+        if fcntl is None:
+            yield
+            return
+        with open(self.path.with_name(self.path.name + '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_header(self) -> dict:
+        if not self.path.is_file() or not self.source.is_file():
+            return None
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header_length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(header_length))
+        if header.get('version') != FORMAT_VERSION or header.get('byteorder') != sys.byteorder:
+            return None
+        header['header_length'] = header_length
+        return header
+
+    @staticmethod
+    def sections(header: dict) -> dict:
+        offsets_start = len(MAGIC) + 4 + header['header_length']
+        blob_start = offsets_start + (header['term_count'] + 1) * 8
+        columns_start = blob_start + header['blob_size'] + (-header['blob_size'] % 8)
+        return {'offsets': offsets_start, 'blob': blob_start, 'columns': columns_start}
+
+    def read_tables(self) -> (dict, list, {str: TripleIndex}):
+        header = self.read_header()
+        sections = self.sections(header)
+        with open(self.path, 'rb') as f:
+            f.seek(sections['offsets'])
+            offsets = array('q')
+            offsets.fromfile(f, header['term_count'] + 1)
+            blob = f.read(header['blob_size'])
+            f.seek(sections['columns'])
+            indexes = {}
+            for name, order in ORDERS.items():
+                columns = []
+                for _ in range(3):
+                    column = array('q')
+                    column.fromfile(f, header['triple_count'])
+                    columns.append(column)
+                indexes[name] = TripleIndex(order, tuple(columns))
+
+        terms = [decode_term(blob[offsets[i]:offsets[i + 1]]) for i in range(header['term_count'])]
+        return header, terms, indexes
+
+    def read(self) -> Graph:
+        start = time.time()
+        header, terms, indexes = self.read_tables()
+
+        g = Graph()
+        for prefix, namespace in header['namespaces'].items():
+            g.bind(prefix, namespace)
+        s, p, o = indexes['spo'].columns
+        g.addN((terms[s[i]], terms[p[i]], terms[o[i]], g) for i in range(len(s)))
+
+        end = time.time()
+        print(f'read snapshot {self.path} in {round(end - start, 2)} seconds')
+        return g
+
+    def read_compact(self) -> Graph:
+        start = time.time()
+        header, terms, indexes = self.read_tables()
+        term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        g = Graph(store=CompactStore(terms, term_ids, indexes, namespaces=header['namespaces']))
+
+        end = time.time()
+        print(f'read compact snapshot {self.path} in {round(end - start, 2)} seconds')
+        return g
+
+    def read_mapped(self) -> Graph:
+        # the memoryviews keep the mapping alive, the pages are shared with every other process mapping this file
+        header = self.read_header()
+        sections = self.sections(header)
+        with open(self.path, 'rb') as f:
+            mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+        offsets = mapped[sections['offsets']:sections['blob']].cast('q')
+        blob = mapped[sections['blob']:sections['blob'] + header['blob_size']]
+        terms = MappedTermTable(offsets, blob)
+
+        column_size = header['triple_count'] * 8
+        position = sections['columns']
+        indexes = {}
+        for name, order in ORDERS.items():
+            columns = []
+            for _ in range(3):
+                columns.append(mapped[position:position + column_size].cast('q'))
+                position += column_size
+            indexes[name] = TripleIndex(order, tuple(columns))
+
+        print(f'mapped snapshot {self.path}')
+        return Graph(store=CompactStore(terms, terms, indexes, namespaces=header['namespaces']))
+
+    def write(self, graph: Graph) -> None:
+        start = time.time()
+        encoded_terms = {}
+        for triple in graph:
+            for term in triple:
+                if term not in encoded_terms:
+                    encoded_terms[term] = encode_term(term)
+
+        # term ids follow the order of the encoded terms, so a term can be looked up by bisection
+        ordered = sorted(encoded_terms.items(), key=lambda item: item[1])
+        term_ids = {term: term_id for term_id, (term, _) in enumerate(ordered)}
+        offsets = array('q', [0])
+        for _, encoded in ordered:
+            offsets.append(offsets[-1] + len(encoded))
+
+        triples = [(term_ids[s], term_ids[p], term_ids[o]) for s, p, o in graph]
+        indexes = [TripleIndex.sorted_from(order, triples, 'q') for order in ORDERS.values()]
+
+        stat = self.source.stat()
+        header = json.dumps({
+            'version': FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'source_sha256': file_sha256(self.source),
+            'source_mtime_ns': stat.st_mtime_ns,
+            'source_size': stat.st_size,
+            'term_count': len(ordered),
+            'triple_count': len(triples),
+            'blob_size': offsets[-1],
+            'namespaces': {prefix: str(namespace) for prefix, namespace in graph.namespaces()}
+        }).encode('utf-8')
+        # room to rewrite the source stat in place, and padding so the arrays that follow start on an 8 byte boundary
+        header += b' ' * HEADER_ROOM
+        header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+        tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            offsets.tofile(f)
+            f.write(b''.join(encoded for _, encoded in ordered))
+            f.write(b'\x00' * (-offsets[-1] % 8))
+            for index in indexes:
+                for column in index.columns:
+                    column.tofile(f)
+        os.replace(tmp_path, self.path)
+
+        end = time.time()
+        print(f'wrote snapshot {self.path} in {round(end - start, 2)} seconds')
+
+
+if __name__ == '__main__':
+    # prebuild the snapshot before starting the workers: python -m TripleAPI.GraphSnapshot CreatingData/vkb_oslo_30k.ttl
+    for source_path in sys.argv[1:]:
+        snapshot = GraphSnapshot(source_path)
+        with snapshot.lock():
+            if not snapshot.is_valid():
+                source_graph = Graph()
+                source_graph.parse(source=source_path, format='turtle')
+                snapshot.write(source_graph)
@@ -0,0 +1,68 @@
+from collections import deque
+from typing import Generator, Iterable
+
+from rdflib import Graph, BNode, URIRef
+
+from TripleAPI.GraphWorkPool import raise_if_cancelled
+
+
+class GraphTraversal:
+    # breadth first walk from the roots over the given relations, every node is expanded once
+    # blank nodes belong to the node that refers to them, their triples follow the triples of that node
+    # max_depth counts the relations followed from a root, max_triples and fan_out (per predicate, per node) cut
+    # the walk short, truncated tells whether that happened
+    def __init__(self, graph: Graph, roots: Iterable, relations: Iterable[URIRef] = (), max_depth: int = None,
+                 max_triples: int = None, fan_out: dict = None):
+        self.graph = graph
+        self.roots = roots
+        self.relations = set(relations)
+        self.max_depth = max_depth
+        self.max_triples = max_triples
+        self.fan_out = fan_out or {}
+        self.touched = 0
+        self.yielded = 0
+        self.truncated = False
+        self._visited = set()
+
+    def __iter__(self) -> Generator:
+        for root in self.roots:
+            if root in self._visited:
+                continue
+            self._visited.add(root)
+            queue = deque([(root, 0)])
+            while len(queue) > 0:
+                raise_if_cancelled()
+                node, depth = queue.popleft()
+                for s, p, o in self._node_triples(node):
+                    if self.max_triples is not None and self.yielded >= self.max_triples:
+                        self.truncated = True
+                        return
+                    self.yielded += 1
+                    yield s, p, o
+                    if p in self.relations and o not in self._visited and not isinstance(o, BNode):
+                        if self.max_depth is not None and depth >= self.max_depth:
+                            self.truncated = True
+                            continue
+                        self._visited.add(o)
+                        queue.append((o, depth + 1))
+
+    def _node_triples(self, node) -> Generator:
+        stack = [node]
+        while len(stack) > 0:
+            raise_if_cancelled()
+            subject = stack.pop()
+            fan_out = {}
+            blank_nodes = []
+            for s, p, o in self.graph.triples((subject, None, None)):
+                self.touched += 1
+                cap = self.fan_out.get(p)
+                if cap is not None:
+                    fan_out[p] = fan_out.get(p, 0) + 1
+                    if fan_out[p] > cap:
+                        self.truncated = True
+                        continue
+                yield s, p, o
+                if isinstance(o, BNode) and o not in self._visited:
+                    self._visited.add(o)
+                    blank_nodes.append(o)
+            stack.extend(reversed(blank_nodes))
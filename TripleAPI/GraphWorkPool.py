@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator, Iterable
+
+_local = threading.local()
+_DONE = object()
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+class WorkCancelledError(Exception):
+    pass
+
+
+def raise_if_cancelled() -> None:
+    # called from long running loops, stops the work of a request that timed out or was cancelled
+    cancel_event = getattr(_local, 'cancel_event', None)
+    if cancel_event is not None and cancel_event.is_set():
+        raise WorkCancelledError('the request was cancelled')
+
+
+class GraphWorkPool:
+    # runs graph work on a bounded thread pool so the event loop keeps serving other requests
+    # at most max_workers requests run at the same time and max_queue more may wait, the rest is rejected
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, timeout: float = 30.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='graph-work')
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    async def run(self, fn, *args, timeout: float = None):
+        self._admit()
+        cancel_event = threading.Event()
+        self._change('pending', 1)
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._call, cancel_event, fn, args)
+            return await self._wait(future, cancel_event, self.timeout if timeout is None else timeout)
+        finally:
+            self._change('pending', -1)
+
+    def stream(self, iterable: Iterable, timeout: float = None) -> AsyncGenerator:
+        # every chunk of the iterable is produced on the pool, a stream that takes longer than timeout to produce its
+        # chunks is cut off. the time the client takes to read them does not count, that is not work on the pool
+        # a saturated pool rejects the stream here, before the response is started
+        self._admit()
+        return self._stream(iter(iterable), self.timeout if timeout is None else timeout)
+
+    async def _stream(self, iterator, timeout: float):
+        # the stream only counts as pending once its first chunk is asked for, a response whose client went away
+        # before the body was iterated never runs this generator, so it would never give its place back
+        self._change('pending', 1)
+        loop = asyncio.get_running_loop()
+        cancel_event = threading.Event()
+        spent = 0.0
+        try:
+            while True:
+                remaining = None if timeout is None else timeout - spent
+                started = loop.time()
+                future = loop.run_in_executor(self._executor, self._call, cancel_event, next, (iterator, _DONE))
+                chunk = await self._wait(future, cancel_event, remaining)
+                spent += loop.time() - started
+                if chunk is _DONE:
+                    return
+                yield chunk
+        except asyncio.TimeoutError:
+            # raised on, so the response is aborted instead of ending as if it were complete
+            print('stream cut off, the request took too long')
+            raise
+        finally:
+            self._change('pending', -1)
+
+    async def _wait(self, future, cancel_event: threading.Event, timeout: float):
+        try:
+            result = await asyncio.wait_for(future, max(timeout, 0) if timeout is not None else None)
+        except asyncio.TimeoutError:
+            cancel_event.set()
+            self._change('timed_out', 1)
+            raise
+        except asyncio.CancelledError:
+            cancel_event.set()
+            self._change('cancelled', 1)
+            raise
+        return result
+
+    def _call(self, cancel_event: threading.Event, fn, args):
+        _local.cancel_event = cancel_event
+        self._change('active', 1)
+        try:
+            raise_if_cancelled()
+            result = fn(*args)
+            self._change('completed', 1)
+            return result
+        finally:
+            self._change('active', -1)
+            _local.cancel_event = None
+
+    def _admit(self) -> None:
+        if self.pending >= self.max_workers + self.max_queue:
+            self._change('rejected', 1)
+            raise PoolSaturatedError('too many graph requests are waiting, try again later')
+
+    def _change(self, counter: str, delta: int) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + delta)
+
+    def stats(self) -> dict:
+        return {'max_workers': self.max_workers, 'max_queue': self.max_queue, 'timeout': self.timeout,
+                'pending': self.pending, 'active': self.active, 'queued': max(self.pending - self.active, 0),
+                'saturation': round(self.pending / (self.max_workers + self.max_queue), 3),
+                'completed': self.completed, 'rejected': self.rejected, 'timed_out': self.timed_out,
+                'cancelled': self.cancelled}
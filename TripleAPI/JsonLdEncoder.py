@@ -0,0 +1,84 @@
+from collections import Counter
+from typing import Iterable
+
+import orjson
+from rdflib import URIRef, BNode, Literal, RDF, XSD
+
+from Common.RdfTerms import sorted_namespaces, compact_iri
+from TripleAPI.GraphWorkPool import raise_if_cancelled
+
+# the relations of an opstelling: Opstelling -> Verkeersbord -> Verkeersteken -> Verkeersbordconcept
+EMBED_RELATIONS = {URIRef('https://data.vlaanderen.be/ns/mobiliteit#omvatVerkeersbord'),
+                   URIRef('https://data.vlaanderen.be/ns/mobiliteit#realiseert'),
+                   URIRef('https://data.vlaanderen.be/ns/mobiliteit#heeftVerkeersbordconcept')}
+
+
+class JsonLdEncoder:
+    # builds compacted and framed JSON-LD straight from triples and encodes it once with orjson
+    # blank nodes and the objects of EMBED_RELATIONS are embedded in the node that refers to them,
+    # as long as exactly one node refers to them, every other node ends up in @graph
+    def __init__(self, namespaces: dict, embed_relations: set = None):
+        self.namespaces = sorted_namespaces(namespaces)
+        self.context = {prefix: namespace for prefix, namespace in sorted(self.namespaces)}
+        self.embed_relations = EMBED_RELATIONS if embed_relations is None else embed_relations
+
+    def encode(self, triples: Iterable) -> bytes:
+        return orjson.dumps(self.build(triples))
+
+    def build(self, triples: Iterable) -> dict:
+        nodes = {}
+        for s, p, o in triples:
+            nodes.setdefault(s, {}).setdefault(p, []).append(o)
+
+        references = Counter(o for properties in nodes.values() for p, objects in properties.items() for o in objects
+                             if o in nodes and (isinstance(o, BNode) or p in self.embed_relations))
+        embeddable = {node for node, count in references.items() if count == 1}
+
+        graph = []
+        emitted = set()
+        for node in nodes:
+            raise_if_cancelled()
+            if node not in embeddable:
+                graph.append(self._node_object(node, nodes, embeddable, emitted))
+        # nodes that only refer to each other have no root yet
+        for node in nodes:
+            raise_if_cancelled()
+            if node not in emitted:
+                graph.append(self._node_object(node, nodes, embeddable, emitted))
+
+        return {'@context': self.context, '@graph': graph}
+
+    def _node_object(self, node, nodes: dict, embeddable: set, emitted: set) -> dict:
+        emitted.add(node)
+        node_object = {} if isinstance(node, BNode) and node in embeddable else {'@id': self._id(node)}
+        for p, objects in nodes[node].items():
+            if p == RDF.type:
+                values = [self._iri(o) for o in objects]
+                node_object['@type'] = values[0] if len(values) == 1 else values
+                continue
+            values = []
+            for o in objects:
+                if o in embeddable and o not in emitted and (isinstance(o, BNode) or p in self.embed_relations):
+                    values.append(self._node_object(o, nodes, embeddable, emitted))
+                else:
+                    values.append(self._value(o))
+            node_object[self._iri(p)] = values[0] if len(values) == 1 else values
+        return node_object
+
+    def _value(self, term):
+        if isinstance(term, Literal):
+            if term.language is not None:
+                return {'@value': str(term), '@language': term.language}
+            if term.datatype is not None and term.datatype != XSD.string:
+                return {'@value': str(term), '@type': self._iri(term.datatype)}
+            return str(term)
+        return {'@id': self._id(term)}
+
+    def _id(self, term) -> str:
+        if isinstance(term, BNode):
+            return f'_:{term}'
+        return self._iri(term)
+
+    def _iri(self, iri) -> str:
+        compacted = compact_iri(self.namespaces, iri)
+        return compacted if compacted is not None else str(iri)
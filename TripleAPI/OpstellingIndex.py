@@ -0,0 +1,73 @@
+from array import array
+from typing import Generator
+
+from rdflib import Graph, URIRef, RDF
+
+from TripleAPI.CompactStore import CompactStore
+from TripleAPI.GraphTraversal import GraphTraversal
+
+OPSTELLING = URIRef('https://data.vlaanderen.be/ns/mobiliteit#Opstelling')
+# Opstelling -> Verkeersbord -> Verkeersteken -> Verkeersbordconcept and Opstelling -> Wegsegment
+FULL_OPSTELLING_RELATIONS = [URIRef('https://data.vlaanderen.be/ns/mobiliteit#omvatVerkeersbord'),
+                             URIRef('https://data.vlaanderen.be/ns/mobiliteit#realiseert'),
+                             URIRef('https://data.vlaanderen.be/ns/mobiliteit#heeftVerkeersbordconcept'),
+                             URIRef('https://data.vlaanderen.be/ns/mobiliteit#hoortBij')]
+
+
+class OpstellingIndex:
+    # the triples of every opstelling with everything it relates to, materialized once when the graph is loaded
+    # terms are stored once, the closure of an opstelling is a flat array of term ids: s, p, o, s, p, o, ...
+    # on a CompactStore those are the ids of its own term table, so on a memory mapped snapshot the terms are decoded
+    # from the shared mapping on read instead of every process keeping a copy of them
+    def __init__(self, relations: [URIRef] = None):
+        self.relations = FULL_OPSTELLING_RELATIONS if relations is None else relations
+        self._terms: list = []
+        self._closures: dict = {}
+
+    def __len__(self):
+        return len(self._closures)
+
+    def __contains__(self, opstelling: URIRef):
+        return opstelling in self._closures
+
+    def __iter__(self):
+        return iter(self._closures)
+
+    @classmethod
+    def from_graph(cls, graph: Graph, relations: [URIRef] = None) -> 'OpstellingIndex':
+        index = cls(relations=relations)
+        index.build(graph, graph.subjects(predicate=RDF.type, object=OPSTELLING))
+        return index
+
+    def build(self, graph: Graph, opstellingen) -> None:
+        store = graph.store if isinstance(graph.store, CompactStore) else None
+        terms = store.terms if store is not None else []
+        typecode = 'i' if len(terms) < 2 ** 31 else 'q'
+        term_ids, closures = {}, {}
+        for opstelling in opstellingen:
+            ids = array(typecode)
+            for triple in self.related_triples(graph, opstelling):
+                for term in triple:
+                    term_id = term_ids.get(term)
+                    if term_id is None:
+                        if store is not None:
+                            term_id = store.term_id(term)
+                        else:
+                            term_id = len(terms)
+                            terms.append(term)
+                        term_ids[term] = term_id
+                    ids.append(term_id)
+            closures[opstelling] = ids
+        self._terms = terms
+        self._closures = closures
+
+    def triples(self, opstelling: URIRef) -> Generator:
+        ids = self._closures.get(opstelling)
+        if ids is None:
+            return
+        terms = self._terms
+        for i in range(0, len(ids), 3):
+            yield terms[ids[i]], terms[ids[i + 1]], terms[ids[i + 2]]
+
+    def related_triples(self, graph: Graph, subject) -> GraphTraversal:
+        return GraphTraversal(graph, [subject], relations=self.relations)
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    # LRU cache with a time to live, entries older than ttl seconds count as a miss
+    def __init__(self, max_size: int = 128, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self) -> list:
+        # least recently used first
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {'size': len(self._entries), 'max_size': self.max_size, 'ttl': self.ttl, 'hits': self.hits,
+                'misses': self.misses, 'hit_ratio': round(self.hits / requests, 3) if requests > 0 else None}
@@ -0,0 +1,110 @@
+import time
+
+from rdflib import Graph, Variable, URIRef, Literal
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+
+from TripleAPI.GraphWorkPool import raise_if_cancelled
+
+
+class QueryLimitError(Exception):
+    pass
+
+
+class QueryRejectedError(QueryLimitError):
+    pass
+
+
+class QueryTimeoutError(QueryLimitError):
+    pass
+
+
+class QueryRowLimitError(QueryLimitError):
+    pass
+
+
+class QueryLimits:
+    # checked while a query runs: every triple the query touches and every row it returns counts
+    # the timeout is on the time the query evaluates, a streamed query is paused while its consumer has the rows
+    def __init__(self, timeout: float = None, max_rows: int = None, check_every: int = 1000):
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.check_every = check_every
+        self.touched = 0
+        self.spent = 0.0
+        self.started = time.monotonic()
+
+    def pause(self) -> None:
+        if self.started is not None:
+            self.spent += time.monotonic() - self.started
+            self.started = None
+
+    def resume(self) -> None:
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return self.spent + (0.0 if self.started is None else time.monotonic() - self.started)
+
+    def touch(self) -> None:
+        self.touched += 1
+        if self.touched % self.check_every == 0:
+            self.check_time()
+
+    def check_time(self) -> None:
+        raise_if_cancelled()
+        if self.timeout is not None and self.elapsed() > self.timeout:
+            raise QueryTimeoutError(f'the query did not finish within {self.timeout} seconds')
+
+    def check_rows(self, rows: int) -> None:
+        if self.max_rows is not None and rows > self.max_rows:
+            raise QueryRowLimitError(f'the query returns more than {self.max_rows} rows, add a LIMIT')
+
+
+class LimitedGraph(Graph):
+    # a view on the same store that reports every triple the query engine reads to the limits
+    def __init__(self, graph: Graph, limits: QueryLimits):
+        super().__init__(store=graph.store, identifier=graph.identifier, namespace_manager=graph.namespace_manager)
+        self.limits = limits
+
+    def triples(self, triple):
+        for t in super().triples(triple):
+            self.limits.touch()
+            yield t
+
+
+def check_full_scan(query: Query) -> None:
+    # rejects a pattern like ?s ?p ?o that shares no variable with the rest of the query, unless a LIMIT stops it early
+    nodes = list(_walk(query.algebra))
+    limited = any(node.name == 'Slice' and node.get('length') is not None for node in nodes)
+    if limited and not {node.name for node in nodes} & {'OrderBy', 'Group', 'AggregateJoin'}:
+        return
+
+    patterns = [triple for node in nodes if node.name == 'BGP' for triple in node.triples]
+    fixed = set()
+    for node in nodes:
+        if node.name == 'RelationalExpression' and node.op == '=':
+            if isinstance(node.expr, Variable) and isinstance(node.other, (URIRef, Literal)):
+                fixed.add(node.expr)
+            elif isinstance(node.other, Variable) and isinstance(node.expr, (URIRef, Literal)):
+                fixed.add(node.other)
+        elif node.name == 'values':
+            fixed.update(variable for row in node.res for variable in row)
+
+    for index, triple in enumerate(patterns):
+        if not all(isinstance(term, Variable) for term in triple):
+            continue
+        others = {term for i, t in enumerate(patterns) if i != index for term in t if isinstance(term, Variable)}
+        if not set(triple) & (others | fixed):
+            raise QueryRejectedError('the pattern ' + ' '.join(term.n3() for term in triple) +
+                                     ' scans every triple, bind one of its variables or add a LIMIT')
+
+
+def _walk(value):
+    if isinstance(value, CompValue):
+        yield value
+        for child in value.values():
+            yield from _walk(child)
+    elif isinstance(value, (list, tuple)):
+        for child in value:
+            yield from _walk(child)
@@ -0,0 +1,123 @@
+import math
+
+from rdflib import Variable, URIRef, Literal
+from rdflib.plugins.sparql.algebra import reorderTriples
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+
+from TripleAPI.SpatialIndex import SpatialIndex, GEOMETRY, LAT, LONG
+
+# the operator as seen from the variable: 3.65 < ?long is ?long > 3.65
+FLIPPED = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+def optimize_query(query: Query, spatial_index: SpatialIndex = None) -> Query:
+    # rewrites FILTERs directly on a basic graph pattern, the FILTER itself is kept so the results stay the same:
+    # - FILTER(?v = <iri>) puts the iri in the triple patterns instead of ?v and binds ?v to the iri again
+    # - lat/long range FILTERs on ?s loc:geometry ?g . ?g geo:lat ?lat . ?g geo:long ?long
+    #   start from the subjects the spatial index finds in those bounds
+    query.algebra = _rewrite(query.algebra, spatial_index)
+    return query
+
+
+def _rewrite(value, spatial_index: SpatialIndex):
+    if isinstance(value, CompValue):
+        for key, child in value.items():
+            value[key] = _rewrite(child, spatial_index)
+        if value.name == 'Filter' and isinstance(value.p, CompValue) and value.p.name == 'BGP':
+            value['p'] = _rewrite_filter(value, spatial_index)
+        return value
+    if isinstance(value, list):
+        return [_rewrite(child, spatial_index) for child in value]
+    return value
+
+
+def _rewrite_filter(node: CompValue, spatial_index: SpatialIndex) -> CompValue:
+    conjuncts = _conjuncts(node.expr)
+    triples = node.p.triples
+    variables = {term for triple in triples for term in triple if isinstance(term, Variable)}
+
+    bound = {}
+    for conjunct in conjuncts:
+        equality = _iri_equality(conjunct)
+        if equality is not None and equality[0] in variables and equality[0] not in bound:
+            bound[equality[0]] = equality[1]
+    if len(bound) > 0:
+        triples = reorderTriples(tuple(bound.get(term, term) for term in triple) for triple in triples)
+    pattern = CompValue('BGP', triples=triples, _vars=node.p._vars)
+    for variable, iri in bound.items():
+        pattern = CompValue('Extend', p=pattern, expr=iri, var=variable, _vars=node.p._vars)
+
+    if spatial_index is not None:
+        candidates = _spatial_candidates(triples, conjuncts, spatial_index)
+        if candidates is not None:
+            subject, subjects = candidates
+            values = CompValue('values', res=[{subject: s} for s in subjects])
+            pattern = CompValue('Join', p1=CompValue('ToMultiSet', p=values), p2=pattern, lazy=True)
+    return pattern
+
+
+def _conjuncts(expr) -> list:
+    if isinstance(expr, CompValue) and expr.name == 'ConditionalAndExpression':
+        return [conjunct for part in [expr.expr] + list(expr.other or []) for conjunct in _conjuncts(part)]
+    return [expr]
+
+
+def _iri_equality(expr):
+    if not isinstance(expr, CompValue) or expr.name != 'RelationalExpression' or expr.op != '=':
+        return None
+    if isinstance(expr.expr, Variable) and isinstance(expr.other, URIRef):
+        return expr.expr, expr.other
+    if isinstance(expr.other, Variable) and isinstance(expr.expr, URIRef):
+        return expr.other, expr.expr
+    return None
+
+
+def _spatial_candidates(triples: list, conjuncts: list, spatial_index: SpatialIndex):
+    # (?s, subjects) when the pattern holds a geometry with both bounds on its latitude or on its longitude
+    geometries = {o: s for s, p, o in triples if p == GEOMETRY and isinstance(s, Variable) and isinstance(o, Variable)}
+    lat_of = {s: o for s, p, o in triples if p == LAT and s in geometries and isinstance(o, Variable)}
+    long_of = {s: o for s, p, o in triples if p == LONG and s in geometries and isinstance(o, Variable)}
+    for geometry, subject in geometries.items():
+        if geometry not in lat_of or geometry not in long_of:
+            continue
+        lat_bounds = _bounds(lat_of[geometry], conjuncts, -90.0, 90.0)
+        long_bounds = _bounds(long_of[geometry], conjuncts, -180.0, 180.0)
+        if lat_bounds[2] or long_bounds[2]:
+            # the spatial index excludes its bounds, so they are widened a little and the FILTER decides
+            return subject, list(spatial_index.query(math.nextafter(lat_bounds[0], -math.inf),
+                                                     math.nextafter(long_bounds[0], -math.inf),
+                                                     math.nextafter(lat_bounds[1], math.inf),
+                                                     math.nextafter(long_bounds[1], math.inf)))
+    return None
+
+
+def _bounds(variable: Variable, conjuncts: list, lower: float, upper: float) -> (float, float, bool):
+    # the tightest lower and upper bound of variable and whether both were given
+    has_lower, has_upper = False, False
+    for conjunct in conjuncts:
+        comparison = _comparison(variable, conjunct)
+        if comparison is None:
+            continue
+        op, value = comparison
+        if op in ('>', '>='):
+            lower, has_lower = max(lower, value), True
+        else:
+            upper, has_upper = min(upper, value), True
+    return lower, upper, has_lower and has_upper
+
+
+def _comparison(variable: Variable, expr):
+    # ?variable op number, also when it is written as number op ?variable
+    if not isinstance(expr, CompValue) or expr.name != 'RelationalExpression' or expr.op not in FLIPPED:
+        return None
+    if expr.expr == variable and isinstance(expr.other, Literal):
+        op, value = expr.op, expr.other
+    elif expr.other == variable and isinstance(expr.expr, Literal):
+        op, value = FLIPPED[expr.op], expr.expr
+    else:
+        return None
+    try:
+        return op, float(value.toPython())
+    except (TypeError, ValueError):
+        return None
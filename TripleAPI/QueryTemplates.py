@@ -0,0 +1,128 @@
+from decimal import Decimal, InvalidOperation
+
+from rdflib import URIRef, Literal, Variable
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+
+VKB = 'https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/'
+WR = 'https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/'
+
+PREFIXES = '''
+prefix mob: <https://data.vlaanderen.be/ns/mobiliteit#>
+prefix loc: <http://www.w3.org/ns/locn#>
+prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#>
+'''
+
+
+class UnknownTemplateError(KeyError):
+    pass
+
+
+class TemplateBindingError(ValueError):
+    pass
+
+
+def iri(namespace: str):
+    return lambda value: value if isinstance(value, URIRef) else URIRef(namespace + str(value))
+
+
+def decimal(value) -> Literal:
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'{value} is not a decimal')
+    # NaN and Infinity are Decimals as well, but the comparisons in the filters raise on them
+    if not number.is_finite():
+        raise ValueError(f'{value} is not a finite decimal')
+    return Literal(number)
+
+
+class QueryTemplate:
+    # a query that is parsed and translated to algebra once, its variables are filled in with initBindings
+    def __init__(self, name: str, query: str, parameters: dict):
+        self.name = name
+        self.query = query
+        self.parameters = parameters
+        self.prepared = prepareQuery(query)
+
+    def bind(self, values: dict) -> dict:
+        # every parameter needs a value, an unbound variable would match everything
+        unknown = set(values) - set(self.parameters)
+        if len(unknown) > 0:
+            raise TemplateBindingError(f'unknown parameters for template {self.name}: {", ".join(sorted(unknown))}')
+        missing = set(self.parameters) - set(values)
+        if len(missing) > 0:
+            raise TemplateBindingError(f'missing parameters for template {self.name}: {", ".join(sorted(missing))}')
+        try:
+            return {name: self.parameters[name](value) for name, value in values.items()}
+        except ValueError as exc:
+            raise TemplateBindingError(f'invalid parameter for template {self.name}: {exc}')
+
+    def with_values(self, values: dict) -> Query:
+        # a copy of the prepared query where every basic graph pattern with one of the variables starts from its terms,
+        # like a VALUES block in the query, e.g. {'s': [candidates]}; the prepared query itself stays as it is
+        values = {Variable(name): terms for name, terms in values.items()}
+        return Query(self.prepared.prologue, _join_values(self.prepared.algebra, values))
+
+
+def _join_values(node: CompValue, values: dict) -> CompValue:
+    # only the graph patterns are copied, the expressions are shared with the prepared query
+    if node.name == 'BGP':
+        pattern = node
+        for variable, terms in values.items():
+            if variable in node._vars:
+                rows = CompValue('values', res=[{variable: term} for term in terms])
+                pattern = CompValue('Join', p1=CompValue('ToMultiSet', p=rows), p2=pattern, lazy=True)
+        return pattern
+    copy = CompValue(node.name, **node)
+    for key in ('p', 'p1', 'p2'):
+        if isinstance(node.get(key), CompValue):
+            copy[key] = _join_values(node[key], values)
+    return copy
+
+
+class QueryTemplateRegistry:
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, template: QueryTemplate) -> None:
+        self._templates[template.name] = template
+
+    def get(self, name: str) -> QueryTemplate:
+        if name not in self._templates:
+            raise UnknownTemplateError(f'there is no query template named {name}')
+        return self._templates[name]
+
+    def __iter__(self):
+        return iter(self._templates.values())
+
+
+query_templates = QueryTemplateRegistry()
+query_templates.register(QueryTemplate(
+    name='opstellingen_by_wegsegment',
+    query=PREFIXES + '''
+SELECT ?s
+WHERE {
+    ?s mob:hoortBij ?segment .
+}''',
+    parameters={'segment': iri(WR)}))
+query_templates.register(QueryTemplate(
+    name='opstellingen_by_bounds',
+    query=PREFIXES + '''
+SELECT ?s
+WHERE {
+    ?s loc:geometry ?g .
+    ?g geo:lat ?lat .
+    ?g geo:long ?long .
+    FILTER (?lower_lat < ?lat && ?lat < ?upper_lat && ?lower_long < ?long && ?long < ?upper_long) .
+}''',
+    parameters={'lower_lat': decimal, 'lower_long': decimal, 'upper_lat': decimal, 'upper_long': decimal}))
+query_templates.register(QueryTemplate(
+    name='triples_by_opstelling',
+    query='''
+SELECT ?s ?p ?o
+WHERE {
+    ?s ?p ?o .
+}''',
+    parameters={'s': iri(VKB)}))
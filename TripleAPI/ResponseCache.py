@@ -0,0 +1,70 @@
+import hashlib
+import itertools
+import threading
+
+from TripleAPI.QueryCache import QueryCache
+from TripleAPI.TripleStore import TripleStore
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    # serialized responses per key and graph version: render(*key) is called once per key until the next load
+    # after a load the keys that were cached before, and the keys from warm_keys(store), are rendered in the background
+    # render returns None when there is nothing for the key, get then returns None as well and nothing is cached
+    def __init__(self, store: TripleStore, render, max_size: int = 1024, warm_keys=None):
+        self.store = store
+        self.render = render
+        self.max_size = max_size
+        self.warm_keys = warm_keys
+        self.cache = QueryCache(max_size=max_size, ttl=None)
+        self._warm_thread: threading.Thread = None
+        store.add_load_listener(self.reload)
+
+    def get(self, key) -> (bytes, str):
+        version = self.store.version
+        cached = self.cache.get((version, key))
+        if cached is not None:
+            return cached
+        return self._render(version, key)
+
+    def _render(self, version: int, key) -> (bytes, str):
+        body = self.render(*key)
+        if body is None:
+            return None
+        rendered = body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        if version == self.store.version:
+            self.cache.put((version, key), rendered)
+        return rendered
+
+    def reload(self, store: TripleStore = None) -> None:
+        # the most recently used keys are rendered first
+        hot_keys = [key for _, key in reversed(self.cache.keys())]
+        self.cache.clear()
+        self._warm_thread = threading.Thread(target=self.warm, args=(hot_keys,), name='response-cache-warm',
+                                             daemon=True)
+        self._warm_thread.start()
+
+    def warm(self, keys: list) -> None:
+        version = self.store.version
+        if self.warm_keys is not None:
+            keys = itertools.chain(keys, self.warm_keys(self.store))
+        keys = list(dict.fromkeys(keys))[:self.max_size]
+        for key in keys:
+            if version != self.store.version:
+                # a newer load started its own warm up
+                return
+            self._render(version, key)
+        print(f'warmed {len(keys)} responses')
+
+    def stats(self) -> dict:
+        return dict(self.cache.stats(), version=self.store.version,
+                    warming=self._warm_thread is not None and self._warm_thread.is_alive())
@@ -0,0 +1,94 @@
+from typing import Generator, Iterable
+
+import orjson
+from rdflib import BNode, Literal, XSD
+
+from Common.RdfTerms import escape_literal
+from TripleAPI.StreamingSerializer import chunked
+
+
+class UnsupportedResultsError(Exception):
+    pass
+
+
+class SparqlResultsSerializer:
+    # writes SPARQL 1.1 query results row by row, a row is a tuple of terms in the order of the variables
+    media_types = {'application/sparql-results+json': 'json', 'text/csv': 'csv', 'text/tab-separated-values': 'tsv'}
+
+    def negotiate(self, accept: str) -> str:
+        # the first media type in the accept header that is a results format, None for the legacy json
+        for media_type in accept.split(','):
+            media_type = media_type.split(';')[0].strip()
+            if media_type in self.media_types:
+                return media_type
+        return None
+
+    def serialize(self, media_type: str, variables: [str], rows: Iterable) -> Generator:
+        return getattr(self, self.media_types[media_type])(variables, rows)
+
+    def boolean(self, media_type: str, answer: bool) -> bytes:
+        # the answer of an ASK query, csv and tsv only hold rows of variables
+        if self.media_types[media_type] != 'json':
+            raise UnsupportedResultsError(f'The answer of an ASK query can not be written as {media_type}')
+        return b'{"head":{},"boolean":' + orjson.dumps(answer) + b'}'
+
+    def json(self, variables: [str], rows: Iterable) -> Generator[bytes, None, None]:
+        yield b'{"head":' + orjson.dumps({'vars': variables}) + b',"results":{"bindings":['
+        yield from chunked(self._json_rows(variables, rows), joiner=b'')
+        yield b']}}'
+
+    def csv(self, variables: [str], rows: Iterable) -> Generator[str, None, None]:
+        # csv keeps only the lexical values, use tsv or json to keep the datatypes
+        yield ','.join(self._csv_field(variable) for variable in variables) + '\r\n'
+        yield from chunked(','.join('' if term is None else self._csv_field(self._csv_value(term)) for term in row)
+                           + '\r\n' for row in rows)
+
+    def tsv(self, variables: [str], rows: Iterable) -> Generator[str, None, None]:
+        yield '\t'.join(f'?{variable}' for variable in variables) + '\n'
+        yield from chunked('\t'.join('' if term is None else self._tsv_value(term) for term in row) + '\n'
+                           for row in rows)
+
+    def _json_rows(self, variables: [str], rows: Iterable) -> Generator[bytes, None, None]:
+        separator = b''
+        for row in rows:
+            yield separator + orjson.dumps({variable: self._json_binding(term)
+                                            for variable, term in zip(variables, row) if term is not None})
+            separator = b','
+
+    @staticmethod
+    def _json_binding(term) -> dict:
+        if isinstance(term, Literal):
+            binding = {'type': 'literal', 'value': str(term)}
+            if term.language is not None:
+                binding['xml:lang'] = term.language
+            elif term.datatype is not None and term.datatype != XSD.string:
+                binding['datatype'] = str(term.datatype)
+            return binding
+        if isinstance(term, BNode):
+            return {'type': 'bnode', 'value': str(term)}
+        return {'type': 'uri', 'value': str(term)}
+
+    @staticmethod
+    def _csv_value(term) -> str:
+        if isinstance(term, BNode):
+            return f'_:{term}'
+        return str(term)
+
+    @staticmethod
+    def _csv_field(value: str) -> str:
+        if any(c in value for c in ',"\r\n'):
+            return '"' + value.replace('"', '""') + '"'
+        return value
+
+    @staticmethod
+    def _tsv_value(term) -> str:
+        if isinstance(term, Literal):
+            lexical = escape_literal(str(term))
+            if term.language is not None:
+                return f'"{lexical}"@{term.language}'
+            if term.datatype is not None and term.datatype != XSD.string:
+                return f'"{lexical}"^^<{term.datatype}>'
+            return f'"{lexical}"'
+        if isinstance(term, BNode):
+            return f'_:{term}'
+        return f'<{term}>'
@@ -0,0 +1,61 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+from rdflib import Graph, URIRef
+
+GEOMETRY = URIRef('http://www.w3.org/ns/locn#geometry')
+LAT = URIRef('http://www.w3.org/2003/01/geo/wgs84_pos#lat')
+LONG = URIRef('http://www.w3.org/2003/01/geo/wgs84_pos#long')
+
+
+class SpatialIndex:
+    # packed grid: points are bucketed in rows of cell_size degrees latitude, every row is sorted on longitude
+    # a bounding box query bisects the longitude range in each row that overlaps the latitude range
+    def __init__(self, cell_size: float = 0.01):
+        self.cell_size = cell_size
+        self._row_keys: [int] = []
+        self._rows: dict = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @classmethod
+    def from_graph(cls, graph: Graph, cell_size: float = 0.01) -> 'SpatialIndex':
+        index = cls(cell_size=cell_size)
+        points = []
+        for subject, geometry in graph.subject_objects(predicate=GEOMETRY):
+            lat = graph.value(geometry, LAT)
+            long = graph.value(geometry, LONG)
+            if lat is None or long is None:
+                continue
+            points.append((float(lat), float(long), subject))
+        index.build(points)
+        return index
+
+    def build(self, points: [tuple]) -> None:
+        rows = {}
+        for lat, long, subject in points:
+            rows.setdefault(self._row_key(lat), []).append((long, lat, subject))
+
+        self._rows = {}
+        for key, row in rows.items():
+            row.sort(key=lambda point: point[0])
+            self._rows[key] = (array('d', (point[0] for point in row)),
+                               array('d', (point[1] for point in row)),
+                               [point[2] for point in row])
+        self._row_keys = sorted(self._rows)
+        self._count = len(points)
+
+    def query(self, lower_lat: float, lower_long: float, upper_lat: float, upper_long: float):
+        first_row = bisect_left(self._row_keys, self._row_key(lower_lat))
+        last_row = bisect_right(self._row_keys, self._row_key(upper_lat))
+        for key in self._row_keys[first_row:last_row]:
+            longs, lats, subjects = self._rows[key]
+            for i in range(bisect_right(longs, lower_long), bisect_left(longs, upper_long)):
+                if lower_lat < lats[i] < upper_lat:
+                    yield subjects[i]
+
+    def _row_key(self, lat: float) -> int:
+        return math.floor(lat / self.cell_size)
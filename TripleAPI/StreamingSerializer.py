@@ -0,0 +1,121 @@
+from typing import Generator, Iterable
+
+import orjson
+from rdflib import BNode, Literal, RDF, XSD
+
+from Common.RdfTerms import sorted_namespaces, escape_literal, compact_iri
+
+CHUNK_SIZE = 64 * 1024
+
+
+def chunked(pieces: Iterable, joiner='') -> Generator:
+    # joins small pieces into chunks of about CHUNK_SIZE, joiner is '' for str and b'' for bytes
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield joiner.join(chunk)
+            chunk, size = [], 0
+    if len(chunk) > 0:
+        yield joiner.join(chunk)
+
+
+class StreamingSerializer:
+    # serializes triples while they are generated, only the triples of the current subject are kept in memory
+    # blank nodes that are yielded while a subject is open are grouped with that subject
+    def __init__(self, namespaces: dict):
+        self.namespaces = sorted_namespaces(namespaces)
+
+    def ntriples(self, triples: Iterable) -> Generator[str, None, None]:
+        yield from chunked(f'{self._term(s)} {self._term(p)} {self._term(o)} .\n' for s, p, o in triples)
+
+    def turtle(self, triples: Iterable) -> Generator[str, None, None]:
+        yield ''.join(f'@prefix {prefix}: <{namespace}> .\n' for prefix, namespace in sorted(self.namespaces)) + '\n'
+        yield from chunked(self._turtle_group(group) for group in self._group_by_subject(triples))
+
+    def ndjson(self, triples: Iterable) -> Generator[bytes, None, None]:
+        # one expanded JSON-LD node object per line
+        for node in self._node_objects(triples):
+            yield orjson.dumps(node) + b'\n'
+
+    def jsonld(self, triples: Iterable) -> Generator[bytes, None, None]:
+        # one expanded JSON-LD document, the node objects of @graph are written while the triples are generated
+        yield b'{"@graph":['
+        nodes = ((b'' if i == 0 else b',') + orjson.dumps(node) for i, node in enumerate(self._node_objects(triples)))
+        yield from chunked(nodes, joiner=b'')
+        yield b']}'
+
+    def _node_objects(self, triples: Iterable) -> Generator[dict, None, None]:
+        # blank nodes are embedded in the node that refers to them
+        for subject, properties, blank_nodes in self._group_by_subject(triples):
+            yield self._node_object(subject, properties, blank_nodes)
+            referenced = {o for po in [properties, *blank_nodes.values()] for _, o in po}
+            for blank_node, blank_properties in blank_nodes.items():
+                if blank_node not in referenced:
+                    node = self._node_object(blank_node, blank_properties, blank_nodes, embedded={blank_node})
+                    yield dict({'@id': f'_:{blank_node}'}, **node)
+
+    def _turtle_group(self, group) -> str:
+        subject, properties, blank_nodes = group
+        blocks = [(subject, properties)] + list(blank_nodes.items())
+        return ''.join(self._term(s, compact=True) + ' ' + ' ;\n    '.join(
+            ('a' if p == RDF.type else self._term(p, compact=True)) + ' ' + self._term(o, compact=True)
+            for p, o in po) + ' .\n\n' for s, po in blocks)
+
+    def _node_object(self, subject, properties, blank_nodes, embedded: set = None) -> dict:
+        embedded = embedded or set()
+        node = {} if isinstance(subject, BNode) else {'@id': str(subject)}
+        for p, o in properties:
+            if p == RDF.type:
+                node.setdefault('@type', []).append(str(o))
+            elif isinstance(o, BNode) and o in blank_nodes and o not in embedded:
+                node.setdefault(str(p), []).append(
+                    self._node_object(o, blank_nodes[o], blank_nodes, embedded | {o}))
+            else:
+                node.setdefault(str(p), []).append(self._value_object(o))
+        return node
+
+    @staticmethod
+    def _value_object(term) -> dict:
+        if isinstance(term, Literal):
+            value = {'@value': str(term)}
+            if term.language is not None:
+                value['@language'] = term.language
+            elif term.datatype is not None and term.datatype != XSD.string:
+                value['@type'] = str(term.datatype)
+            return value
+        if isinstance(term, BNode):
+            return {'@id': f'_:{term}'}
+        return {'@id': str(term)}
+
+    @staticmethod
+    def _group_by_subject(triples: Iterable):
+        subject, properties, blank_nodes = None, [], {}
+        for s, p, o in triples:
+            if isinstance(s, BNode) and subject is not None and s != subject:
+                blank_nodes.setdefault(s, []).append((p, o))
+                continue
+            if s != subject:
+                if subject is not None:
+                    yield subject, properties, blank_nodes
+                subject, properties, blank_nodes = s, [], {}
+            properties.append((p, o))
+        if subject is not None:
+            yield subject, properties, blank_nodes
+
+    def _term(self, term, compact: bool = False) -> str:
+        if isinstance(term, Literal):
+            lexical = escape_literal(str(term))
+            if term.language is not None:
+                return f'"{lexical}"@{term.language}'
+            if term.datatype is not None and term.datatype != XSD.string:
+                return f'"{lexical}"^^{self._term(term.datatype, compact=compact)}'
+            return f'"{lexical}"'
+        if isinstance(term, BNode):
+            return f'_:{term}'
+        if compact:
+            compacted = compact_iri(self.namespaces, term)
+            if compacted is not None:
+                return compacted
+        return f'<{term}>'
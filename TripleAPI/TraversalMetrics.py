@@ -0,0 +1,25 @@
+import threading
+
+from TripleAPI.GraphTraversal import GraphTraversal
+
+
+class TraversalMetrics:
+    # totals over the traversals that were answered, a streamed response only knows them after its last triple
+    def __init__(self):
+        self.responses = 0
+        self.touched = 0
+        self.returned = 0
+        self.truncated = 0
+        self._lock = threading.Lock()
+
+    def record(self, traversal: GraphTraversal) -> None:
+        with self._lock:
+            self.responses += 1
+            self.touched += traversal.touched
+            self.returned += traversal.yielded
+            self.truncated += 1 if traversal.truncated else 0
+
+    def stats(self) -> dict:
+        return {'responses': self.responses, 'touched': self.touched, 'returned': self.returned,
+                'truncated': self.truncated,
+                'touched_per_returned': round(self.touched / self.returned, 3) if self.returned > 0 else None}
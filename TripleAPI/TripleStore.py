@@ -1,44 +1,318 @@
+import itertools
+import threading
 import time
+from dataclasses import dataclass
+from typing import Generator, Iterable
 
 from rdflib import Graph
+from rdflib.plugins.sparql.algebra import translateQuery
+from rdflib.plugins.sparql.evaluate import evalQuery
+from rdflib.plugins.sparql.parser import parseQuery
+
+from TripleAPI.BordIndex import BordIndex
+from TripleAPI.CompactStore import CompactStore
+from TripleAPI.GraphSnapshot import GraphSnapshot
+from TripleAPI.OpstellingIndex import OpstellingIndex
+from TripleAPI.QueryCache import QueryCache
+from TripleAPI.QueryGuard import QueryLimits, LimitedGraph, QueryRejectedError, check_full_scan
+from TripleAPI.QueryOptimizer import optimize_query
+from TripleAPI.QueryTemplates import QueryTemplate
+from TripleAPI.SpatialIndex import SpatialIndex
+from TripleAPI.WegsegmentIndex import WegsegmentIndex
+
+
+@dataclass(frozen=True)
+class StoreState:
+    # the graph with its indexes, a load builds a new state and swaps it in as a whole
+    # a request takes the state once, so it finishes on the same graph even when a reload swaps in a new one
+    graph: Graph
+    source: object
+    spatial_index: SpatialIndex
+    opstelling_index: OpstellingIndex
+    wegsegment_index: WegsegmentIndex
+    bord_index: BordIndex
+    version: int
 
 
 class TripleStore:
-    def __init__(self):
-        self._graph: Graph = None
-        self._source = None
+    # memory: rdflib Memory store, compact: CompactStore in this process,
+    # shared: CompactStore on the memory mapped snapshot, shared by every worker that loads the same source
+    backends = ['memory', 'compact', 'shared']
+
+    def __init__(self, use_snapshot: bool = True, snapshot_dir=None, backend: str = 'memory',
+                 query_cache_size: int = 128, query_cache_ttl: float = 300.0, query_timeout: float = 30.0,
+                 max_rows: int = 10000, reject_full_scans: bool = True, max_stream_rows: int = 1000000,
+                 cached_stream_rows: int = 1000, optimize_queries: bool = True, stream_timeout: float = 120.0):
+        if backend not in self.backends:
+            raise ValueError(f'backend should be one of {self.backends}')
+        if backend == 'shared' and not use_snapshot:
+            raise ValueError('the shared backend needs use_snapshot')
+        self._state: StoreState = None
+        self.backend = backend
+        self.use_snapshot = use_snapshot
+        self.snapshot_dir = snapshot_dir
+        self._load_listeners = []
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reload_thread: threading.Thread = None
+        self.reload_status = {'status': 'idle'}
+        self.query_cache = QueryCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        self.query_timeout = query_timeout
+        self.max_rows = max_rows
+        self.reject_full_scans = reject_full_scans
+        self.max_stream_rows = max_stream_rows
+        # streamed results get their own timeout, long enough to evaluate max_stream_rows rows
+        self.stream_timeout = stream_timeout
+        self.cached_stream_rows = cached_stream_rows
+        self.optimize_queries = optimize_queries
+
+    @property
+    def _graph(self) -> Graph:
+        return self._state.graph if self._state is not None else None
+
+    @property
+    def _source(self):
+        return self._state.source if self._state is not None else None
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        return self._state.spatial_index if self._state is not None else None
+
+    @property
+    def opstelling_index(self) -> OpstellingIndex:
+        return self._state.opstelling_index if self._state is not None else None
+
+    @property
+    def wegsegment_index(self) -> WegsegmentIndex:
+        return self._state.wegsegment_index if self._state is not None else None
+
+    @property
+    def bord_index(self) -> BordIndex:
+        return self._state.bord_index if self._state is not None else None
+
+    @property
+    def version(self) -> int:
+        return self._state.version if self._state is not None else 0
 
     def get_graph(self, source=None):
-        if self._graph is None:
-            self.load(source)
-        else:
-            if source != self._source:
-                self.load(source)
-        return self._graph
-
-    def load(self, source):
+        state = self._state
+        if state is None or source != state.source:
+            state = self.load(source)
+        return state.graph
+
+    def get_state(self) -> StoreState:
+        state = self._state
+        if state is None:
+            raise RuntimeError('There is no datasource loaded yet')
+        return state
+
+    def load(self, source) -> StoreState:
+        # the new graph and its indexes are built next to the current state, which stays in use until the swap
+        with self._load_lock:
+            g = self._read(source)
+            print(f'loaded {len(g)} triples')
+            spatial_index = SpatialIndex.from_graph(g)
+            print(f'indexed {len(spatial_index)} geometries')
+            opstelling_index = OpstellingIndex.from_graph(g)
+            print(f'indexed {len(opstelling_index)} opstellingen')
+            wegsegment_index = WegsegmentIndex.from_graph(g)
+            print(f'indexed {len(wegsegment_index)} wegsegmenten')
+            bord_index = BordIndex.from_graph(g)
+            print(f'indexed {len(bord_index)} borden')
+            state = StoreState(graph=g, source=source, spatial_index=spatial_index, opstelling_index=opstelling_index,
+                               wegsegment_index=wegsegment_index, bord_index=bord_index, version=self.version + 1)
+            self._state = state
+            self.query_cache.clear()
+        for listener in self._load_listeners:
+            listener(self)
+        return state
+
+    def reload(self, source=None) -> bool:
+        # loads source, or the current source again, in a background thread and swaps it in when it is ready
+        # returns False when a reload is still running
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            source = self._source if source is None else source
+            self.reload_status = {'status': 'loading', 'source': str(source), 'started': time.time()}
+            self._reload_thread = threading.Thread(target=self._reload, args=(source,), name='triplestore-reload',
+                                                   daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def _reload(self, source) -> None:
+        try:
+            state = self.load(source)
+        except Exception as exc:
+            print(f'reloading {source} failed: {exc}')
+            self.reload_status = dict(self.reload_status, status='failed', error=str(exc), finished=time.time())
+            return
+        self.reload_status = dict(self.reload_status, status='loaded', version=state.version, finished=time.time())
+
+    def _read(self, source) -> Graph:
+        snapshot = GraphSnapshot(source, snapshot_dir=self.snapshot_dir) if self.use_snapshot else None
+        if snapshot is not None and not snapshot.source.is_file():
+            snapshot = None
+
+        g = None
+        if snapshot is not None:
+            with snapshot.lock():
+                if not snapshot.is_valid():
+                    g = self._parse(source)
+                    snapshot.write(g)
+            if g is None or self.backend == 'shared':
+                readers = {'memory': snapshot.read, 'compact': snapshot.read_compact, 'shared': snapshot.read_mapped}
+                g = readers[self.backend]()
+        if g is None:
+            g = self._parse(source)
+        if self.backend != 'memory' and not isinstance(g.store, CompactStore):
+            g = Graph(store=CompactStore.from_graph(g))
+        return g
+
+    def add_load_listener(self, listener) -> None:
+        # listener(store) is called after every load, when the new graph and its indexes are in place
+        self._load_listeners.append(listener)
+
+    @staticmethod
+    def _parse(source) -> Graph:
         g = Graph()
         g.parse(source=source, format='turtle')
-        self._graph = g
-        print(f'loaded {len(self._graph)} triples')
-        self._source = source
+        return g
+
+    def perform_sparql_query(self, query: str = '', timeout: float = None, max_rows: int = None,
+                             state: StoreState = None) -> dict:
+        state = state or self.get_state()
+        cached = self._get(state, query)
+        if cached is not None:
+            print(f'cached query: {query}')
+            return cached
 
-    def perform_sparql_query(self, query: str = '') -> dict:
         print(f'performing query: {query}')
         start = time.time()
 
-        result = self._graph.query(query)
+        parsed_query = self._parse_query(query, state)
+        limits = self._limits(timeout, max_rows)
+        result_dict = self._result_to_dict(LimitedGraph(state.graph, limits).query(parsed_query), limits)
+
+        end = time.time()
+        time_spent = round(end - start, 3)
+        print(f"Time to process query: {time_spent}, return {len(result_dict['data'])} rows of data")
+
+        self._put(state, query, result_dict)
+        return result_dict
+
+    def perform_prepared_query(self, template: QueryTemplate, bindings: dict, use_cache: bool = True,
+                               state: StoreState = None, values: dict = None) -> dict:
+        # values are joined into the query as a VALUES block would be, e.g. {'s': [candidates]}
+        state = state or self.get_state()
+        cache_key = (template.name, tuple(sorted(bindings.items())))
+        if values is not None:
+            cache_key += (tuple((name, tuple(terms)) for name, terms in sorted(values.items())),)
+        if use_cache:
+            cached = self._get(state, cache_key)
+            if cached is not None:
+                return cached
+
+        limits = self._limits()
+        result_dict = self._result_to_dict(
+            LimitedGraph(state.graph, limits).query(template.prepared if values is None else template.with_values(values),
+                                                    initBindings=bindings), limits)
+
+        if use_cache:
+            self._put(state, cache_key, result_dict)
+        return result_dict
+
+    def stream_sparql_query(self, query: str, timeout: float = None, max_rows: int = None,
+                            state: StoreState = None) -> ([str], Iterable):
+        # returns the variables and the rows as tuples of terms, the rows are read from rdflib while they are consumed
+        # for an ASK query the variables are None and the boolean answer takes the place of the rows
+        state = state or self.get_state()
+        parsed_query = self._parse_query(query, state)
+        return self._stream(('rows', query), parsed_query, {}, timeout, max_rows, state)
+
+    def stream_prepared_query(self, template: QueryTemplate, bindings: dict,
+                              state: StoreState = None) -> ([str], Iterable):
+        return self._stream(('rows', template.name, tuple(sorted(bindings.items()))), template.prepared, bindings,
+                            state=state)
+
+    def _parse_query(self, query: str, state: StoreState):
+        parsed_query = translateQuery(parseQuery(query))
+        if self.reject_full_scans:
+            check_full_scan(parsed_query)
+        if self.optimize_queries:
+            optimize_query(parsed_query, state.spatial_index)
+        return parsed_query
+
+    def _stream(self, cache_key, query, bindings: dict, timeout: float = None, max_rows: int = None,
+                state: StoreState = None) -> ([str], Iterable):
+        state = state or self.get_state()
+        if query.algebra.name not in ('SelectQuery', 'AskQuery'):
+            raise QueryRejectedError('Only SELECT and ASK queries have results that can be streamed')
+        cached = self._get(state, cache_key)
+        if cached is not None:
+            return cached if cached[0] is None else (cached[0], iter(cached[1]))
+
+        limits = self._limits(self.stream_timeout if timeout is None else timeout,
+                              self.max_stream_rows if max_rows is None else max_rows)
+        # evalQuery instead of Graph.query: the rdflib Result keeps every row it returned, the bindings generator does not
+        result = evalQuery(LimitedGraph(state.graph, limits), query, bindings)
+        if result['type_'] == 'ASK':
+            self._put(state, cache_key, (None, result['askAnswer']))
+            return None, result['askAnswer']
+        variables = [str(variable) for variable in result['vars_']]
+        rows = self._rows(result['bindings'], result['vars_'], limits, cache_key, state)
+        # the first row is read right away, so a query that fails early still fails before the response starts
+        first = next(rows, None)
+        return variables, rows if first is None else itertools.chain([first], rows)
+
+    def _rows(self, bindings, variables: list, limits: QueryLimits, cache_key,
+              state: StoreState) -> Generator[tuple, None, None]:
+        # small results are kept while they are streamed and cached once the last row is read
+        kept = []
+        count = 0
+        for solution in bindings:
+            # rdflib leaves out the empty solutions as well
+            if not solution:
+                continue
+            count += 1
+            limits.check_time()
+            limits.check_rows(count)
+            row = tuple(solution.get(variable) for variable in variables)
+            if kept is not None:
+                kept.append(row)
+                if len(kept) > self.cached_stream_rows:
+                    kept = None
+            # the time the consumer takes to write the row to a slow client does not count against the timeout
+            limits.pause()
+            yield row
+            limits.resume()
+        if kept is not None:
+            self._put(state, cache_key, ([str(variable) for variable in variables], kept))
+
+    def _get(self, state: StoreState, key):
+        # the results are cached per graph version, like the responses, so a request that still runs on the previous
+        # state never gets rows of the new graph, and a result put just after a load can not be hit by the new state
+        return self.query_cache.get((state.version, key))
+
+    def _put(self, state: StoreState, key, value) -> None:
+        # a result of a state that was swapped out in the meantime is not cached
+        if state is self._state:
+            self.query_cache.put((state.version, key), value)
+
+    def _limits(self, timeout: float = None, max_rows: int = None) -> QueryLimits:
+        return QueryLimits(timeout=self.query_timeout if timeout is None else timeout,
+                           max_rows=self.max_rows if max_rows is None else max_rows)
+
+    @staticmethod
+    def _result_to_dict(result, limits: QueryLimits) -> dict:
         result_dict = {'headers': [], 'data': []}
         for key in result.vars:
             result_dict['headers'].append(str(key))
         for row in result:
+            limits.check_time()
+            limits.check_rows(len(result_dict['data']) + 1)
             result_row = []
             for key in result.vars:
                 result_row.append(str(row[key]))
             result_dict['data'].append(result_row)
-
-        end = time.time()
-        time_spent = round(end - start, 3)
-        print(f"Time to process query: {time_spent}, return {len(result_dict['data'])} rows of data")
-
         return result_dict
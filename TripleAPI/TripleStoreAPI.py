@@ -1,20 +1,58 @@
+import itertools
 import re
-from typing import Generator
-
-from rdflib import URIRef, BNode, Graph, Namespace
-
-from TripleAPI.TripleStore import TripleStore
+from typing import Generator, Iterable
+
+from rdflib import URIRef, BNode, Graph
+
+from TripleAPI.BordIndex import BORD_RELATIONS
+from TripleAPI.GraphTraversal import GraphTraversal
+from TripleAPI.OpstellingIndex import FULL_OPSTELLING_RELATIONS
+from TripleAPI.QueryGuard import QueryRejectedError
+from TripleAPI.QueryTemplates import query_templates
+from TripleAPI.TripleStore import TripleStore, StoreState
+
+NAMESPACES = {
+    'mob': 'https://data.vlaanderen.be/ns/mobiliteit#',
+    'vkb': 'https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/',
+    'asset': 'https://data.awvvlaanderen.be/id/asset/',
+    'wr': 'https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/',
+    'orgvl': 'https://data.vlaanderen.be/doc/organisatie/',
+    'od': 'https://data.vlaanderen.be/ns/openbaardomein#',
+    'geo': 'http://www.w3.org/2003/01/geo/wgs84_pos#',
+    'loc': 'http://www.w3.org/ns/locn#',
+    'skos': 'http://www.w3.org/2004/02/skos/core#',
+    'weg': 'https://data.vlaanderen.be/ns/weg#',
+    'org': 'http://www.w3.org/ns/org#'
+}
 
 
 class TripleStoreAPI:
-    def __init__(self, store: TripleStore):
+    # every request takes the state of the store once and reads only that state,
+    # so a reload that swaps in a new graph never changes the graph under a running request
+    def __init__(self, store: TripleStore, max_depth: int = 8, max_triples: int = None, fan_out: dict = None):
         self.store = store
-        if self.store._source is not None:
-            self.source = self.store._source
+        self.max_depth = max_depth
+        self.max_triples = max_triples
+        self.fan_out = fan_out
+
+    def traverse(self, roots: Iterable, relations: Iterable[URIRef] = (), state: StoreState = None) -> GraphTraversal:
+        # iterate the result to get the triples, touched and truncated are known once it is exhausted
+        state = state or self.store.get_state()
+        return GraphTraversal(state.graph, roots, relations=relations, max_depth=self.max_depth,
+                              max_triples=self.max_triples, fan_out=self.fan_out)
 
     def perform_sparql_query(self, query: str = '') -> dict:
         if query == '':
             return {}
+        return self.store.perform_sparql_query(query=self.clean_query(query))
+
+    def stream_sparql_query(self, query: str) -> ([str], Iterable):
+        if query == '':
+            raise QueryRejectedError('there is no query to run')
+        return self.store.stream_sparql_query(query=self.clean_query(query))
+
+    @staticmethod
+    def clean_query(query: str) -> str:
         while '\n' in query:
             query = query.replace('\n', ' ')
         while '\r' in query:
@@ -26,118 +64,112 @@ class TripleStoreAPI:
         for keyword in reserved_list:
             if re.search(keyword, query, re.IGNORECASE):
                 raise PermissionError('Not allow to run this query')
+        return query
+
+    def perform_template_query(self, template_name: str, bindings: dict, use_cache: bool = True,
+                               state: StoreState = None) -> dict:
+        template = query_templates.get(template_name)
+        return self.store.perform_prepared_query(template, template.bind(bindings), use_cache=use_cache, state=state)
 
-        return self.store.perform_sparql_query(query=query)
+    def stream_template_query(self, template_name: str, bindings: dict) -> ([str], Iterable):
+        template = query_templates.get(template_name)
+        return self.store.stream_prepared_query(template, template.bind(bindings))
 
     @staticmethod
     async def create_graph_from_triples(triples):
         g = Graph()
-        g.bind('mob', Namespace('https://data.vlaanderen.be/ns/mobiliteit#'))
-        g.bind('vkb', Namespace('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/'))
-        g.bind('asset', Namespace('https://data.awvvlaanderen.be/id/asset/'))
-        g.bind('wr',
-               Namespace('https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/'))
-        g.bind('orgvl', 'https://data.vlaanderen.be/doc/organisatie/')
-        g.bind('od', 'https://data.vlaanderen.be/ns/openbaardomein#')
-        g.bind('geo', 'http://www.w3.org/2003/01/geo/wgs84_pos#')
-        g.bind('loc', 'http://www.w3.org/ns/locn#')
-        g.bind('skos', 'http://www.w3.org/2004/02/skos/core#')
-        g.bind('weg', 'https://data.vlaanderen.be/ns/weg#')
-        g.bind('org', 'http://www.w3.org/ns/org#')
+        for prefix, namespace in NAMESPACES.items():
+            g.bind(prefix, namespace)
         for triple in triples:
             g.add(triple)
         return g
 
     def get_opstellingen_by_bounds(self, lower_lat: float, lower_long: float, upper_lat: float,
-                                             upper_long: float):
-        g = self.store.get_graph(self.source)
-        lats = g.subject_objects(predicate=URIRef('http://www.w3.org/2003/01/geo/wgs84_pos#lat'))
-        lat_subjects = []
-        for lat in lats:
-            if (lower_lat < float(lat[1]) < upper_lat):
-                lat_subjects.append(lat[0])
-
-        long_subjects = []
-        longs = g.subject_objects(predicate=URIRef('http://www.w3.org/2003/01/geo/wgs84_pos#long'))
-        for long in longs:
-            if (lower_long < float(long[1]) < upper_long):
-                long_subjects.append(long[0])
-
-        inters = set(lat_subjects).intersection(long_subjects)
-
-        for inter in inters:
-            for subject in g.subjects(predicate=URIRef('http://www.w3.org/ns/locn#geometry'), object=inter):
-                yield from self.yield_triples_found_by_subject(subject)
-
-    def get_opstellingen_by_bounds_by_sparql(self, lower_lat: float, lower_long: float, upper_lat: float, upper_long: float):
-        query = '''
-prefix mob: <https://data.vlaanderen.be/ns/mobiliteit#>
-prefix loc: <http://www.w3.org/ns/locn#>
-prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#>
-
-SELECT ?s
-WHERE {
-    ?s loc:geometry ?g .
-    ?g geo:lat ?lat .
-    ?g geo:long ?long .''' + \
-                f'FILTER ({lower_lat} < ?lat && ?lat < {upper_lat} && {lower_long} < ?long && ?long < {upper_long}) .' \
-                + '}'
-        results = self.perform_sparql_query(query)
+                                   upper_long: float) -> GraphTraversal:
+        state = self.store.get_state()
+        return self.traverse(state.spatial_index.query(lower_lat, lower_long, upper_lat, upper_long), state=state)
+
+    def get_opstellingen_by_bounds_by_sparql(self, lower_lat: float, lower_long: float, upper_lat: float,
+                                             upper_long: float) -> GraphTraversal:
+        state = self.store.get_state()
+        return self.traverse(self._opstellingen_in_bounds_by_sparql(lower_lat, lower_long, upper_lat, upper_long,
+                                                                    state), state=state)
+
+    def _opstellingen_in_bounds_by_sparql(self, lower_lat: float, lower_long: float, upper_lat: float,
+                                          upper_long: float, state: StoreState) -> Generator:
+        # the spatial index narrows down the candidates, the prepared FILTER query still decides which ones match
+        # the candidates are joined into that one query, so it is evaluated once for the whole request
+        template = query_templates.get('opstellingen_by_bounds')
+        bindings = template.bind({'lower_lat': lower_lat, 'lower_long': lower_long, 'upper_lat': upper_lat,
+                                  'upper_long': upper_long})
+        candidates = list(state.spatial_index.query(lower_lat, lower_long, upper_lat, upper_long))
+        if len(candidates) == 0:
+            return
+        results = self.store.perform_prepared_query(template, bindings, use_cache=False, state=state,
+                                                    values={'s': candidates})
         for row in results['data']:
-            yield from self.yield_triples_found_by_subject(URIRef(row[0]))
-
-    def get_opstellingen_by_wegsegment(self, wegsegment_id: str):
-        graph = self.store.get_graph(self.source)
-        results = graph.subjects(predicate=URIRef('https://data.vlaanderen.be/ns/mobiliteit#hoortBij'),
-                                 object=URIRef('https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/'
-                                               f'wegenregister/{wegsegment_id}'))
-
-        for opstelling in results:
-            yield from self.yield_triples_found_by_subject(opstelling)
-
-    def get_opstellingen_by_wegsegment_using_sparql(self, wegsegment_id: str):
-        query = """
-        SELECT ?s ?segment
-        WHERE { 
-            ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> .
-            ?s <https://data.vlaanderen.be/ns/mobiliteit#hoortBij> ?segment .
-            FILTER (?segment = <https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/""" + \
-            f'{wegsegment_id}>)' + '}'
-
-        results = self.perform_sparql_query(query)
-        for row in results['data']:
-            yield from self.yield_triples_found_by_subject(URIRef(row[0]))
+            yield URIRef(row[0])
+
+    def get_opstellingen_by_wegsegment(self, wegsegment_id: str) -> GraphTraversal:
+        state = self.store.get_state()
+        return self.traverse(state.wegsegment_index.get(wegsegment_id), state=state)
+
+    def get_opstellingen_by_wegsegmenten(self, wegsegment_ids: [str], ranges: [(int, int)] = ()) -> GraphTraversal:
+        # ranges are (lower, upper) pairs of wegsegment ids, both included
+        state = self.store.get_state()
+        index = state.wegsegment_index
+        segments = itertools.chain(wegsegment_ids,
+                                   itertools.chain.from_iterable(index.range(lower, upper) for lower, upper in ranges))
+        return self.traverse(index.opstellingen(segments), state=state)
+
+    def get_opstellingen_batch(self, ids: [str], wegsegment_ids: [str]) -> GraphTraversal:
+        # one walk for every opstelling, shared nodes like concepts and segments are written once
+        state = self.store.get_state()
+        return self.traverse(self._batch_roots(ids, wegsegment_ids, state), relations=FULL_OPSTELLING_RELATIONS,
+                             state=state)
+
+    @staticmethod
+    def _batch_roots(ids: [str], wegsegment_ids: [str], state: StoreState) -> Generator:
+        for id in ids:
+            yield URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/' + id)
+        yield from state.wegsegment_index.opstellingen(wegsegment_ids)
+
+    def get_borden(self, code: str = None, beheerder: str = None, bounds: tuple = None) -> GraphTraversal:
+        # bounds is (lower_lat, lower_long, upper_lat, upper_long) of the opstellingen the borden belong to
+        state = self.store.get_state()
+        return self.traverse(self._borden(state, code, beheerder, bounds), relations=BORD_RELATIONS, state=state)
+
+    def get_opstellingen_by_borden(self, code: str = None, beheerder: str = None,
+                                   bounds: tuple = None) -> GraphTraversal:
+        state = self.store.get_state()
+        return self.traverse(state.bord_index.opstellingen(self._borden(state, code, beheerder, bounds)),
+                             relations=FULL_OPSTELLING_RELATIONS, state=state)
+
+    @staticmethod
+    def _borden(state: StoreState, code: str, beheerder: str, bounds: tuple) -> Iterable:
+        opstellingen = set(state.spatial_index.query(*bounds)) if bounds is not None else None
+        return state.bord_index.borden(code=code, beheerder=beheerder, opstellingen=opstellingen)
 
-    def get_asset_triples(self, asset_id: str) -> Generator:
-        if self.store.get_graph(self.source) is None:
-            raise RuntimeError('There is no datasource loaded yet')
+    def get_opstellingen_by_wegsegment_using_sparql(self, wegsegment_id: str) -> GraphTraversal:
+        state = self.store.get_state()
+        results = self.perform_template_query('opstellingen_by_wegsegment', {'segment': wegsegment_id}, state=state)
+        return self.traverse((URIRef(row[0]) for row in results['data']), state=state)
 
+    def get_asset_triples(self, asset_id: str) -> GraphTraversal:
         asset_ref = URIRef(f'https://data.awvvlaanderen.be/id/asset/{asset_id}')
 
-        yield from self.yield_triples_found_by_subject(asset_ref)
-
-    def yield_triples_found_by_subject(self, asset_ref: [URIRef, BNode]):
-        for s, p, o in self.store.get_graph(self.source).triples((asset_ref, None, None)):
-            yield s, p, o
-            if isinstance(o, BNode):
-                yield from self.yield_triples_found_by_subject(o)
-
-    def get_all_related_triples(self, asset_ref: URIRef, use_relations=None) -> Generator:
-        if use_relations is None:
-            use_relations = []
-        also_get = []
-        for s, p, o in self.yield_triples_found_by_subject(asset_ref):
-            yield s, p, o
-            if p in use_relations:
-                also_get.append(o)
-        for also in also_get:
-            yield from self.get_all_related_triples(also, use_relations=use_relations)
-
-    def get_full_opstelling_triples(self, id) -> Generator:
-        relations_to_use = [URIRef('https://data.vlaanderen.be/ns/mobiliteit#omvatVerkeersbord'),
-                            URIRef('https://data.vlaanderen.be/ns/mobiliteit#realiseert'),
-                            URIRef('https://data.vlaanderen.be/ns/mobiliteit#heeftVerkeersbordconcept'),
-                            URIRef('https://data.vlaanderen.be/ns/mobiliteit#hoortBij')]
-        yield from self.get_all_related_triples(
-            asset_ref=URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/' + id),
-            use_relations=relations_to_use)
+        return self.yield_triples_found_by_subject(asset_ref)
+
+    def yield_triples_found_by_subject(self, asset_ref: [URIRef, BNode]) -> GraphTraversal:
+        return self.traverse([asset_ref])
+
+    def get_all_related_triples(self, asset_ref: URIRef, use_relations=None) -> GraphTraversal:
+        return self.traverse([asset_ref], relations=use_relations or [])
+
+    def get_full_opstelling_triples(self, id) -> Iterable:
+        # the state is taken when the triples are asked for, not when the first triple is read
+        state = self.store.get_state()
+        opstelling_ref = URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/' + id)
+        if opstelling_ref in state.opstelling_index:
+            return state.opstelling_index.triples(opstelling_ref)
+        return self.traverse([opstelling_ref], relations=FULL_OPSTELLING_RELATIONS, state=state)
@@ -0,0 +1,60 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Generator, Iterable
+
+from rdflib import Graph, URIRef
+
+HOORT_BIJ = URIRef('https://data.vlaanderen.be/ns/mobiliteit#hoortBij')
+WEGSEGMENT = 'https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/'
+
+
+class WegsegmentIndex:
+    # wegsegment id -> the opstellingen that belong to it, built once when the graph is loaded
+    # the numeric ids are also kept sorted, so a range of ids is two bisections
+    def __init__(self):
+        self._opstellingen: dict = {}
+        self._numeric_ids = array('q')
+        self._numeric_keys: [str] = []
+
+    def __len__(self):
+        return len(self._opstellingen)
+
+    def __contains__(self, wegsegment_id: str):
+        return wegsegment_id in self._opstellingen
+
+    def __iter__(self):
+        return iter(self._opstellingen)
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> 'WegsegmentIndex':
+        index = cls()
+        index.build((opstelling, str(segment)[len(WEGSEGMENT):])
+                    for opstelling, segment in graph.subject_objects(predicate=HOORT_BIJ)
+                    if str(segment).startswith(WEGSEGMENT))
+        return index
+
+    def build(self, pairs: Iterable[tuple]) -> None:
+        # pairs of (opstelling, wegsegment id)
+        opstellingen = {}
+        for opstelling, wegsegment_id in pairs:
+            opstellingen.setdefault(wegsegment_id, {})[opstelling] = None
+        self._opstellingen = {key: tuple(value) for key, value in opstellingen.items()}
+        numeric = sorted((int(key), key) for key in self._opstellingen if key.isdigit())
+        self._numeric_ids = array('q', (number for number, _ in numeric))
+        self._numeric_keys = [key for _, key in numeric]
+
+    def get(self, wegsegment_id: str) -> tuple:
+        return self._opstellingen.get(wegsegment_id, ())
+
+    def range(self, lower: int, upper: int) -> [str]:
+        # the wegsegment ids from lower up to and including upper
+        return self._numeric_keys[bisect_left(self._numeric_ids, lower):bisect_right(self._numeric_ids, upper)]
+
+    def opstellingen(self, wegsegment_ids: Iterable[str]) -> Generator[URIRef, None, None]:
+        # an opstelling that belongs to several of the segments is yielded once
+        seen = set()
+        for wegsegment_id in wegsegment_ids:
+            for opstelling in self._opstellingen.get(wegsegment_id, ()):
+                if opstelling not in seen:
+                    seen.add(opstelling)
+                    yield opstelling
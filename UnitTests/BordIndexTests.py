@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from rdflib import URIRef
+
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI
+
+QUERY = """PREFIX mob: <https://data.vlaanderen.be/ns/mobiliteit#>
+PREFIX od: <https://data.vlaanderen.be/ns/openbaardomein#>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+SELECT ?opstelling ?bord WHERE {
+    ?opstelling mob:omvatVerkeersbord ?bord .
+    ?bord mob:realiseert ?teken .
+    ?teken mob:heeftVerkeersbordconcept ?concept .
+    ?concept skos:prefLabel "F34a" .
+    ?bord od:beheerder <https://data.vlaanderen.be/doc/organisatie/OVO028759> .
+}"""
+
+
+class BordIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TripleStore()
+        cls.graph = cls.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+
+    def test_code_and_beheerder_match_sparql(self):
+        expected = {(row[0], row[1]) for row in self.graph.query(QUERY)}
+        index = self.store.bord_index
+        borden = list(index.borden(code='F34a', beheerder='OVO028759'))
+        self.assertGreater(len(borden), 0)
+        self.assertSetEqual(expected, {(index.opstelling(bord), bord) for bord in borden})
+        self.assertTrue(all(index.code(bord) == 'F34a' for bord in index.borden(code='F34a')))
+        self.assertListEqual([], list(index.borden(code='unknown', beheerder='OVO028759')))
+        with self.assertRaises(ValueError):
+            index.borden()
+
+    def test_borden_within_bounds(self):
+        api = TripleStoreAPI(self.store)
+        borden = set(self.store.bord_index.borden(code='F34a'))
+        opstellingen = set(self.store.bord_index.opstellingen(borden))
+        bounds = (51.03, 3.65, 51.05, 3.75)
+        in_bounds = set(self.store.spatial_index.query(*bounds))
+
+        triples = list(api.get_opstellingen_by_borden(code='F34a', bounds=bounds))
+        self.assertSetEqual(opstellingen & in_bounds,
+                            {s for s, p, o in triples if isinstance(s, URIRef) and s in opstellingen})
+        bord_triples = set(api.get_borden(code='F34a', bounds=bounds))
+        self.assertTrue(all(self.store.bord_index.opstelling(s) in in_bounds
+                            for s, p, o in bord_triples if s in borden))
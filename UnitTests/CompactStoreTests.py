@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+from rdflib import Graph, URIRef, Literal, RDF, XSD
+
+from TripleAPI.CompactStore import CompactStore
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI
+
+
+class CompactStoreTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = Graph()
+        cls.graph.parse('CreatingData/vkb_oslo_1000.ttl', format='turtle')
+        cls.compact = Graph(store=CompactStore.from_graph(cls.graph))
+
+    def test_all_triple_patterns_match_memory_store(self):
+        opstelling = URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/1044565')
+        omvat = URIRef('https://data.vlaanderen.be/ns/mobiliteit#omvatVerkeersbord')
+        bord = next(self.graph.objects(opstelling, omvat))
+        patterns = [(None, None, None), (opstelling, None, None), (opstelling, omvat, None), (opstelling, omvat, bord),
+                    (opstelling, None, bord), (None, omvat, None), (None, omvat, bord), (None, None, bord),
+                    (None, RDF.type, URIRef('https://data.vlaanderen.be/ns/mobiliteit#Opstelling')),
+                    (None, URIRef('https://schema.org/unitCode'), Literal('MTR')),
+                    (URIRef('http://example.org/unknown'), None, None),
+                    (None, None, Literal('1.0', datatype=XSD.decimal))]
+        for pattern in patterns:
+            with self.subTest(pattern=pattern):
+                self.assertSetEqual(set(self.graph.triples(pattern)), set(self.compact.triples(pattern)))
+        self.assertEqual(len(self.graph), len(self.compact))
+
+    def test_api_on_compact_backend(self):
+        store = TripleStore(backend='compact')
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        triple_api = TripleStoreAPI(store)
+
+        triples = list(triple_api.get_opstellingen_by_wegsegment(wegsegment_id='665218'))
+        self.assertGreater(len(triples), 0)
+        result = triple_api.perform_sparql_query(
+            'SELECT ?s WHERE { ?s <https://data.vlaanderen.be/ns/mobiliteit#hoortBij> '
+            '<https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/665218> }')
+        self.assertGreater(len(result['data']), 0)
+
+    def test_compact_store_is_read_only(self):
+        with self.assertRaises(TypeError):
+            self.compact.add((URIRef('http://example.org/s'), RDF.type, URIRef('http://example.org/o')))
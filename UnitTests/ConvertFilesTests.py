@@ -0,0 +1,153 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+import CreatingData.main as convert
+
+CREATING_DATA = Path(__file__).resolve().parent.parent / 'CreatingData'
+
+
+def feature(id: int, wegsegment_id: int, code: str = 'C43') -> dict:
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [104000.0 + id, 194000.0 + id]},
+            'properties': {'id': id, 'beheerder': {'key': 1, 'wegenregisterCode': '44021', 'naam': 'Gemeente Gent'},
+                           'aanzichten': [{'hoek': 0.5, 'wegsegmentid': wegsegment_id, 'borden': [
+                               {'id': id * 10, 'code': code, 'parameters': [], 'x': 0, 'y': 0, 'breedte': 700,
+                                'hoogte': 700, 'vorm': 'rond'}]}]}}
+
+
+class ConvertFilesTests(TestCase):
+    def setUp(self):
+        # the beheerders are read relative to CreatingData
+        self.cwd = os.getcwd()
+        os.chdir(CREATING_DATA)
+        self.directory = Path(tempfile.mkdtemp())
+        self.a = self.write_export('a.json', [feature(1001, 11), feature(1002, 12), feature(1003, 11)])
+        self.b = self.write_export('b.json', [feature(2001, 21), feature(2002, 22, code='F1a')])
+        self.output = self.directory / 'vkb.ttl'
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def write_export(self, name: str, features: [dict]) -> Path:
+        path = self.directory / name
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(features, f)
+        return path
+
+    def build(self, file_paths: [Path], format: str = 'nt') -> dict:
+        return convert.convert_files_incremental(file_paths, self.output, max_workers=1, format=format)
+
+    def assertSameAsFullBuild(self, file_paths: [Path]):
+        full_output = self.directory / 'full.ttl'
+        convert.convert_files(file_paths, full_output, max_workers=1)
+        self.assertTrue(isomorphic(self.parse(full_output), self.parse(self.output)))
+
+    @staticmethod
+    def parse(path: Path) -> Graph:
+        graph = Graph()
+        graph.parse(path, format='turtle')
+        return graph
+
+    def fragments(self) -> [str]:
+        return sorted(path.suffix for path in Path(f'{self.output}.parts').iterdir() if path.name != 'manifest.json')
+
+    def test_convert_chunk_matches_the_graph_conversion(self):
+        features = [feature(1001, 11), feature(1002, 12, code='F1a'), feature(1003, 11)]
+        export = self.write_export('chunk.json', features)
+        for format in ['nt', 'turtle']:
+            with self.subTest(format=format):
+                convert.init_worker(format)
+                text, uris = convert.convert_chunk(features)
+                # the parent writes the prefixes once, the chunks of every worker use them
+                prefixes = io.StringIO()
+                convert.TurtleWriter(prefixes, convert.NAMESPACES).write_prefixes()
+                graph = Graph()
+                graph.parse(data=prefixes.getvalue() + text, format='turtle')
+                self.assertTrue(isomorphic(convert.load_file_into_graph(export, None), graph))
+                self.assertListEqual([convert.NAMESPACES['vkb'] + str(id) for id in (1001, 1002, 1003)], uris)
+
+    def test_output_keeps_the_order_with_several_chunks_in_flight(self):
+        features = [feature(3000 + i, i % 7, code=['C43', 'F1a', 'A1a'][i % 3]) for i in range(60)]
+        export = self.write_export('c.json', features)
+        convert.convert_files([export], self.output, chunk_size=1, max_workers=3)
+
+        graph = convert.load_file_into_graph(export, None)
+        self.assertTrue(isomorphic(graph, self.parse(self.output)))
+        ids = []
+        with open(self.output, encoding='utf-8') as f:
+            for line in f:
+                subject = line.split(' ', 1)[0]
+                if subject.startswith('<' + convert.NAMESPACES['vkb']) and '_' not in subject and subject not in ids:
+                    ids.append(subject)
+        self.assertListEqual([f'<{convert.NAMESPACES["vkb"]}{3000 + i}>' for i in range(60)], ids)
+
+    def test_unchanged_exports_are_not_converted_again(self):
+        summary = self.build([self.a, self.b])
+        self.assertListEqual([str(self.a), str(self.b)], summary['converted'])
+        self.assertEqual(5, summary['added_opstellingen'])
+
+        summary = self.build([self.a, self.b])
+        self.assertListEqual([], summary['converted'])
+        self.assertEqual(2, summary['unchanged'])
+        self.assertSameAsFullBuild([self.a, self.b])
+
+    def test_changed_export_is_converted_again(self):
+        self.build([self.a, self.b])
+        self.write_export('b.json', [feature(2001, 23), feature(2003, 22)])
+
+        summary = self.build([self.a, self.b])
+        self.assertListEqual([str(self.b)], summary['converted'])
+        self.assertEqual((1, 1), (summary['added_opstellingen'], summary['removed_opstellingen']))
+        self.assertSameAsFullBuild([self.a, self.b])
+
+    def test_removed_export(self):
+        self.build([self.a, self.b])
+
+        summary = self.build([self.a])
+        self.assertListEqual([str(self.b)], summary['removed'])
+        self.assertEqual(2, summary['removed_opstellingen'])
+        self.assertListEqual(['.nt'], self.fragments())
+        self.assertSameAsFullBuild([self.a])
+
+    def test_format_switch_converts_everything_and_deletes_the_old_fragments(self):
+        self.build([self.a, self.b])
+
+        summary = self.build([self.a, self.b], format='turtle')
+        self.assertEqual(2, len(summary['converted']))
+        self.assertListEqual(['.ttl', '.ttl'], self.fragments())
+        self.assertSameAsFullBuild([self.a, self.b])
+
+    def test_interrupted_run_keeps_the_previous_output(self):
+        self.build([self.a, self.b])
+        before = self.parse(self.output)
+        self.write_export('a.json', [feature(1001, 13)])
+        self.write_export('b.json', [feature(2001, 23)])
+
+        convert_file = convert.convert_file
+        calls = []
+
+        def interrupted(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise KeyboardInterrupt()
+            return convert_file(*args)
+
+        with patch.object(convert, 'convert_file', side_effect=interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.build([self.a, self.b])
+        self.assertTrue(isomorphic(before, self.parse(self.output)))
+
+        # the manifest was not written, so both exports are converted again
+        summary = self.build([self.a, self.b])
+        self.assertEqual(2, len(summary['converted']))
+        self.assertListEqual(['.nt', '.nt'], self.fragments())
+        self.assertSameAsFullBuild([self.a, self.b])
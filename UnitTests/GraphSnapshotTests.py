@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from rdflib import Namespace, URIRef
+
+from TripleAPI.GraphSnapshot import GraphSnapshot
+from TripleAPI.TripleStore import TripleStore
+
+GEO = Namespace('http://www.w3.org/2003/01/geo/wgs84_pos#')
+
+
+class GraphSnapshotTests(TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.source = self.directory / 'vkb_oslo_1000.ttl'
+        shutil.copy('CreatingData/vkb_oslo_1000.ttl', self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot_is_written_and_read(self):
+        parsed = TripleStore().get_graph(str(self.source))
+        snapshot = GraphSnapshot(self.source)
+        self.assertTrue(snapshot.is_valid())
+
+        # the blank node ids are kept, so every triple has to come back, the geometry literals as well
+        for read in [snapshot.read(), snapshot.read_compact(), snapshot.read_mapped()]:
+            self.assertEqual(len(parsed), len(read))
+            self.assertSetEqual(set(parsed), set(read))
+        latitudes = [o for o in read.objects(None, GEO.lat)]
+        self.assertEqual(1000, len(latitudes))
+        self.assertTrue(all(isinstance(o.toPython(), Decimal) for o in latitudes))
+
+    def test_snapshot_is_invalidated_when_source_changes(self):
+        TripleStore().get_graph(str(self.source))
+        snapshot = GraphSnapshot(self.source)
+
+        os.utime(self.source, ns=(0, 0))
+        self.assertTrue(snapshot.is_valid())
+
+        with open(self.source, 'a', encoding='utf-8') as f:
+            f.write('\nvkb:1 a mob:Opstelling .\n')
+        self.assertFalse(snapshot.is_valid())
+
+        graph = TripleStore().get_graph(str(self.source))
+        self.assertEqual(25589, len(graph))
+        self.assertTrue(snapshot.is_valid())
+
+    def test_source_stat_is_refreshed_after_the_sha_matches(self):
+        TripleStore().get_graph(str(self.source))
+        snapshot = GraphSnapshot(self.source)
+
+        for mtime_ns in [0, 1700000000123456789]:
+            os.utime(self.source, ns=(mtime_ns, mtime_ns))
+            self.assertTrue(snapshot.is_valid())
+            self.assertEqual(mtime_ns, snapshot.read_header()['source_mtime_ns'])
+            with patch('TripleAPI.GraphSnapshot.file_sha256') as file_sha256:
+                self.assertTrue(snapshot.is_valid())
+            file_sha256.assert_not_called()
+        self.assertEqual(25588, len(snapshot.read_mapped()))
+
+    def test_mapped_snapshot_matches_parsed_graph(self):
+        # the first store parses the source and writes the snapshot, the shared store maps that snapshot
+        parsed = TripleStore().get_graph(str(self.source))
+        mapped = TripleStore(backend='shared').get_graph(str(self.source))
+        self.assertEqual(len(parsed), len(mapped))
+        self.assertSetEqual(set(parsed), set(mapped))
+
+        self.assertEqual(0, len(list(mapped.triples((URIRef('http://example.org/unknown'), None, None)))))
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from rdflib import Graph, URIRef, BNode, Literal
+
+from TripleAPI.GraphTraversal import GraphTraversal
+
+EX = 'http://example.org/'
+REL = URIRef(EX + 'rel')
+NAME = URIRef(EX + 'name')
+
+
+class GraphTraversalTests(TestCase):
+    def setUp(self):
+        # a -> b -> c -> a is a cycle, every node has a name and a blank node with a value
+        self.graph = Graph()
+        for source, target in [('a', 'b'), ('b', 'c'), ('c', 'a')]:
+            self.graph.add((URIRef(EX + source), REL, URIRef(EX + target)))
+        for node in 'abc':
+            blank_node = BNode()
+            self.graph.add((URIRef(EX + node), NAME, Literal(node)))
+            self.graph.add((URIRef(EX + node), URIRef(EX + 'detail'), blank_node))
+            self.graph.add((blank_node, URIRef(EX + 'value'), Literal(node)))
+
+    def test_cycle_is_expanded_once(self):
+        traversal = GraphTraversal(self.graph, [URIRef(EX + 'a')], relations=[REL])
+        triples = list(traversal)
+        self.assertEqual(len(self.graph), len(triples))
+        self.assertSetEqual(set(self.graph), set(triples))
+        self.assertEqual(len(self.graph), traversal.touched)
+        self.assertFalse(traversal.truncated)
+
+    def test_breadth_first_with_blank_nodes_after_their_subject(self):
+        triples = list(GraphTraversal(self.graph, [URIRef(EX + 'a')], relations=[REL]))
+        subjects = [s for s, p, o in triples if not isinstance(s, BNode)]
+        self.assertListEqual([URIRef(EX + 'a')] * 3 + [URIRef(EX + 'b')] * 3 + [URIRef(EX + 'c')] * 3, subjects)
+        self.assertIsInstance(triples[3][0], BNode)
+
+    def test_max_depth(self):
+        traversal = GraphTraversal(self.graph, [URIRef(EX + 'a')], relations=[REL], max_depth=1)
+        self.assertSetEqual({URIRef(EX + 'a'), URIRef(EX + 'b')},
+                            {s for s, p, o in traversal if not isinstance(s, BNode)})
+        self.assertTrue(traversal.truncated)
+
+    def test_max_triples_and_fan_out(self):
+        traversal = GraphTraversal(self.graph, [URIRef(EX + 'a')], relations=[REL], max_triples=4)
+        self.assertEqual(4, len(list(traversal)))
+        self.assertTrue(traversal.truncated)
+
+        traversal = GraphTraversal(self.graph, [URIRef(EX + 'a')], relations=[REL], fan_out={NAME: 0})
+        self.assertNotIn(NAME, {p for s, p, o in traversal})
+        self.assertTrue(traversal.truncated)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from rdflib import Graph, Literal, RDF, URIRef
+from starlette.responses import StreamingResponse
+
+from TripleAPI.GraphTraversal import GraphTraversal
+from TripleAPI.GraphWorkPool import GraphWorkPool, PoolSaturatedError, WorkCancelledError, raise_if_cancelled
+from TripleAPI.JsonLdEncoder import JsonLdEncoder
+
+
+class GraphWorkPoolTests(TestCase):
+    def test_run_returns_result_off_the_event_loop(self):
+        pool = GraphWorkPool(max_workers=2, max_queue=2)
+
+        async def run():
+            return await pool.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(asyncio.run(run()).startswith('graph-work'))
+        self.assertEqual(1, pool.stats()['completed'])
+        self.assertEqual(0, pool.stats()['pending'])
+
+    def test_timeout_cancels_the_work(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=0, timeout=0.05)
+        stopped = threading.Event()
+
+        def slow():
+            try:
+                while True:
+                    raise_if_cancelled()
+                    time.sleep(0.01)
+            except WorkCancelledError:
+                stopped.set()
+
+        async def run():
+            await pool.run(slow)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(run())
+        self.assertTrue(stopped.wait(1))
+        self.assertEqual(1, pool.stats()['timed_out'])
+
+    def test_saturated_pool_rejects(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def run():
+            first = asyncio.create_task(pool.run(release.wait))
+            second = asyncio.create_task(pool.run(release.wait))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(PoolSaturatedError):
+                await pool.run(release.wait)
+            self.assertEqual(1, pool.stats()['queued'])
+            release.set()
+            await asyncio.gather(first, second)
+
+        asyncio.run(run())
+        self.assertEqual(1, pool.stats()['rejected'])
+
+    def test_stream_yields_every_chunk(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=1)
+
+        async def run():
+            return [chunk async for chunk in pool.stream(str(i) for i in range(5))]
+
+        self.assertListEqual(['0', '1', '2', '3', '4'], asyncio.run(run()))
+        self.assertEqual(0, pool.stats()['pending'])
+
+    def test_stream_is_rejected_by_a_saturated_pool(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def run():
+            running = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with self.assertRaises(PoolSaturatedError):
+                pool.stream(str(i) for i in range(2))
+            release.set()
+            await asyncio.gather(*running)
+            return [chunk async for chunk in pool.stream(str(i) for i in range(2))]
+
+        self.assertListEqual(['0', '1'], asyncio.run(run()))
+        self.assertEqual(1, pool.stats()['rejected'])
+        self.assertEqual(0, pool.stats()['pending'])
+
+    def test_response_whose_client_went_away_gives_its_place_back(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=1)
+
+        async def disconnected():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            # the client is already gone, sending blocks until the response is cancelled
+            await asyncio.Event().wait()
+
+        async def run():
+            for _ in range(3):
+                response = StreamingResponse(pool.stream(str(i) for i in range(2)), media_type='text/plain')
+                await response({'type': 'http'}, disconnected, send)
+
+        asyncio.run(run())
+        self.assertEqual(0, pool.stats()['pending'])
+        self.assertEqual(0, pool.stats()['rejected'])
+
+    def test_stream_that_runs_out_of_time_is_aborted(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=0, timeout=0.05)
+
+        def slow():
+            yield 'first'
+            while True:
+                raise_if_cancelled()
+                time.sleep(0.01)
+
+        chunks = []
+
+        async def run():
+            async for chunk in pool.stream(slow()):
+                chunks.append(chunk)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(run())
+        self.assertListEqual(['first'], chunks)
+        self.assertEqual(0, pool.stats()['pending'])
+
+    def test_slow_client_does_not_count_against_the_timeout(self):
+        pool = GraphWorkPool(max_workers=1, max_queue=0, timeout=0.05)
+
+        async def run():
+            chunks = []
+            async for chunk in pool.stream(str(i) for i in range(5)):
+                # the client reads every chunk slower than the whole stream may take to produce
+                await asyncio.sleep(0.03)
+                chunks.append(chunk)
+            return chunks
+
+        self.assertListEqual(['0', '1', '2', '3', '4'], asyncio.run(run()))
+        self.assertEqual(0, pool.stats()['timed_out'])
+
+    def test_traversal_and_json_ld_stop_when_cancelled(self):
+        graph = Graph()
+        subjects = [URIRef(f'urn:x:{i}') for i in range(3)]
+        for subject in subjects:
+            graph.add((subject, RDF.value, Literal(1)))
+        pool = GraphWorkPool(max_workers=1, max_queue=0)
+
+        def cancelled_after_the_first(event: threading.Event, items):
+            # the work was still running when its request got cancelled
+            for i, item in enumerate(items):
+                if i == 1:
+                    event.set()
+                yield item
+
+        event = threading.Event()
+        with self.assertRaises(WorkCancelledError):
+            pool._call(event, list, (GraphTraversal(graph, cancelled_after_the_first(event, subjects)),))
+        event = threading.Event()
+        with self.assertRaises(WorkCancelledError):
+            pool._call(event, JsonLdEncoder({}).encode, (cancelled_after_the_first(event, list(graph)),))
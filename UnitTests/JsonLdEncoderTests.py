@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+import orjson
+from rdflib import Graph, BNode, XSD
+
+from TripleAPI.JsonLdEncoder import JsonLdEncoder
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI, NAMESPACES
+
+
+class JsonLdEncoderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        store = TripleStore()
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        cls.triple_api = TripleStoreAPI(store)
+        cls.encoder = JsonLdEncoder(dict(NAMESPACES, xsd=str(XSD)))
+
+    def test_encoded_json_ld_contains_the_same_triples(self):
+        for triples in [list(self.triple_api.get_full_opstelling_triples('1044565')),
+                        list(self.triple_api.get_opstellingen_by_bounds(lower_lat=51.03, lower_long=3.65,
+                                                                        upper_lat=51.05, upper_long=3.75))]:
+            graph = Graph().parse(data=self.encoder.encode(triples), format='json-ld')
+            without_bnodes = lambda ts: {t for t in ts if not any(isinstance(term, BNode) for term in t)}
+            self.assertEqual(len(set(triples)), len(graph))
+            self.assertSetEqual(without_bnodes(triples), without_bnodes(graph))
+
+    def test_opstelling_is_framed(self):
+        document = orjson.loads(self.encoder.encode(self.triple_api.get_full_opstelling_triples('1044565')))
+        opstelling = next(node for node in document['@graph'] if node['@id'] == 'vkb:1044565')
+
+        self.assertEqual('mob:Opstelling', opstelling['@type'])
+        self.assertEqual('geo:Point', opstelling['loc:geometry']['@type'])
+        self.assertEqual('xsd:decimal', opstelling['loc:geometry']['geo:lat']['@type'])
+        borden = opstelling['mob:omvatVerkeersbord']
+        bord = borden[0] if isinstance(borden, list) else borden
+        self.assertIn('skos:prefLabel', bord['mob:realiseert']['mob:heeftVerkeersbordconcept'])
+        self.assertEqual('https://data.vlaanderen.be/ns/mobiliteit#', document['@context']['mob'])
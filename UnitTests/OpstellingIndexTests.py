@@ -0,0 +1,52 @@
+import tempfile
+from unittest import TestCase
+
+from rdflib import URIRef
+
+from TripleAPI.GraphSnapshot import MappedTermTable
+from TripleAPI.OpstellingIndex import OpstellingIndex, FULL_OPSTELLING_RELATIONS
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI
+
+
+class OpstellingIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TripleStore()
+        cls.graph = cls.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        cls.triple_api = TripleStoreAPI(cls.store)
+
+    def test_closure_equals_traversal(self):
+        index = self.store.opstelling_index
+        self.assertEqual(1000, len(index))
+        for id in ['1044565', '102806', '100021']:
+            opstelling = URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/' + id)
+            if opstelling not in index:
+                continue
+            self.assertListEqual(list(self.triple_api.get_all_related_triples(opstelling, FULL_OPSTELLING_RELATIONS)),
+                                 list(index.triples(opstelling)))
+
+    def test_full_opstelling_triples_uses_the_index(self):
+        triples = list(self.triple_api.get_full_opstelling_triples('1044565'))
+        self.assertGreater(len(triples), 0)
+        self.assertListEqual(triples, list(self.store.opstelling_index.triples(
+            URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/1044565'))))
+        self.assertListEqual([], list(self.triple_api.get_full_opstelling_triples('does_not_exist')))
+
+    def test_build_for_some_opstellingen(self):
+        opstelling = URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/1044565')
+        index = OpstellingIndex()
+        index.build(self.graph, [opstelling])
+        self.assertEqual(1, len(index))
+        self.assertListEqual(list(self.store.opstelling_index.triples(opstelling)), list(index.triples(opstelling)))
+
+    def test_shared_backend_decodes_from_the_snapshot(self):
+        opstelling = URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/1044565')
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            store = TripleStore(snapshot_dir=snapshot_dir, backend='shared')
+            graph = store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+            index = store.opstelling_index
+            # the index keeps no terms of its own, only the ids of the mapped term table
+            self.assertIs(graph.store.terms, index._terms)
+            self.assertIsInstance(index._terms, MappedTermTable)
+            self.assertListEqual(list(index.related_triples(graph, opstelling)), list(index.triples(opstelling)))
@@ -0,0 +1,65 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from TripleAPI.QueryCache import QueryCache
+from TripleAPI.TripleStore import TripleStore
+
+SOURCE = 'CreatingData/vkb_oslo_1000.ttl'
+QUERY = 'SELECT ?s WHERE { ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> }'
+
+
+class QueryCacheTests(TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = QueryCache(max_size=2, ttl=None)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(3, cache.get('c'))
+        self.assertDictEqual({'size': 2, 'max_size': 2, 'ttl': None, 'hits': 3, 'misses': 1, 'hit_ratio': 0.75},
+                             cache.stats())
+
+    def test_expired_entry_is_a_miss(self):
+        cache = QueryCache(max_size=2, ttl=0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(0, len(cache))
+
+    def test_cache_is_cleared_on_load(self):
+        store = TripleStore()
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        query = 'SELECT ?s WHERE { ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> }'
+        first = store.perform_sparql_query(query)
+        self.assertIs(first, store.perform_sparql_query(query))
+        self.assertEqual(1, store.query_cache.hits)
+
+        store.load('CreatingData/vkb_oslo_1000.ttl')
+        self.assertEqual(0, len(store.query_cache))
+        self.assertIsNot(first, store.perform_sparql_query(query))
+
+    def test_result_put_just_after_a_load_is_not_served(self):
+        store = TripleStore()
+        store.get_graph(SOURCE)
+        put = store.query_cache.put
+
+        def load_before_put(key, value):
+            # the load swaps in the new state between the check in _put and the put
+            store.load(SOURCE)
+            put(key, value)
+
+        with patch.object(store.query_cache, 'put', side_effect=load_before_put):
+            stale = store.perform_sparql_query(QUERY)
+        self.assertEqual(1, len(store.query_cache))
+        self.assertIsNot(stale, store.perform_sparql_query(QUERY))
+
+    def test_request_on_the_previous_state_does_not_get_rows_of_the_new_graph(self):
+        store = TripleStore()
+        store.get_graph(SOURCE)
+        previous = store.get_state()
+        store.load(SOURCE)
+        current = store.perform_sparql_query(QUERY)
+        self.assertIs(current, store.perform_sparql_query(QUERY))
+        self.assertIsNot(current, store.perform_sparql_query(QUERY, state=previous))
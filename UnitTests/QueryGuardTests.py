@@ -0,0 +1,59 @@
+import time
+from unittest import TestCase
+
+from rdflib.plugins.sparql.algebra import translateQuery
+from rdflib.plugins.sparql.parser import parseQuery
+
+from TripleAPI.QueryGuard import check_full_scan, QueryRejectedError, QueryRowLimitError, QueryTimeoutError
+from TripleAPI.TripleStore import TripleStore
+
+
+class QueryGuardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TripleStore()
+        cls.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+
+    def test_full_scan_is_rejected(self):
+        with self.assertRaises(QueryRejectedError):
+            check_full_scan(translateQuery(parseQuery('SELECT ?s ?p ?o WHERE { ?s ?p ?o }')))
+        with self.assertRaises(QueryRejectedError):
+            check_full_scan(translateQuery(parseQuery('SELECT ?s ?p ?o WHERE { ?s ?p ?o } ORDER BY ?s LIMIT 10')))
+
+    def test_bound_patterns_are_allowed(self):
+        for query in ['SELECT ?s ?p ?o WHERE { ?s ?p ?o } LIMIT 10',
+                      'SELECT ?p ?o WHERE { ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> . ?s ?p ?o }',
+                      'SELECT ?s ?p ?o WHERE { ?s ?p ?o . FILTER(?s = <https://apps.mow.vlaanderen.be/verkeersborden/'
+                      'rest/zi/verkeersborden/1044565>) }',
+                      'SELECT ?s ?p ?o WHERE { VALUES ?s { <https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/'
+                      'verkeersborden/1044565> } ?s ?p ?o }']:
+            check_full_scan(translateQuery(parseQuery(query)))
+
+    def test_row_limit_is_enforced_while_iterating(self):
+        query = 'SELECT ?s WHERE { ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> }'
+        with self.assertRaises(QueryRowLimitError):
+            self.store.perform_sparql_query(query, max_rows=10)
+        self.assertIsNone(self.store.query_cache.get((self.store.version, query)))
+        self.assertEqual(1000, len(self.store.perform_sparql_query(query)['data']))
+
+    def test_timeout_is_enforced(self):
+        query = 'SELECT ?s ?r WHERE { ?s ?p ?o . ?o ?q ?r }'
+        with self.assertRaises(QueryTimeoutError):
+            self.store.perform_sparql_query(query, timeout=0.0)
+
+    def test_slow_consumer_of_a_stream_does_not_count_against_the_timeout(self):
+        query = 'SELECT ?s WHERE { ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> } LIMIT 20'
+        variables, rows = self.store.stream_sparql_query(query, timeout=0.1)
+        count = 0
+        for _ in rows:
+            time.sleep(0.02)
+            count += 1
+        self.assertEqual(20, count)
+
+    def test_streams_have_their_own_timeout(self):
+        store = TripleStore(query_timeout=60.0, stream_timeout=0.0)
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        query = 'SELECT ?s ?r WHERE { ?s ?p ?o . ?o ?q ?r }'
+        with self.assertRaises(QueryTimeoutError):
+            variables, rows = store.stream_sparql_query(query)
+            list(rows)
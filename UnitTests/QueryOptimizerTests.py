@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from rdflib import URIRef, Variable
+from rdflib.plugins.sparql.algebra import translateQuery
+from rdflib.plugins.sparql.parser import parseQuery
+
+from TripleAPI.QueryGuard import _walk
+from TripleAPI.QueryOptimizer import optimize_query
+from TripleAPI.TripleStore import TripleStore
+
+OPSTELLING = URIRef('https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/1044565')
+QUERIES = [
+    """SELECT ?s ?segment WHERE {
+    ?s a <https://data.vlaanderen.be/ns/mobiliteit#Opstelling> .
+    ?s <https://data.vlaanderen.be/ns/mobiliteit#hoortBij> ?segment .
+    FILTER (?segment = <https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/966119>) }""",
+    f"""SELECT ?s ?p ?o WHERE {{ ?s ?p ?o . FILTER({OPSTELLING.n3()} = ?s && ?p != <x:y>) }}""",
+    f"""SELECT ?s WHERE {{ ?s ?p ?o . FILTER(?s = {OPSTELLING.n3()} && ?s = <x:y>) }}""",
+    """prefix loc: <http://www.w3.org/ns/locn#>
+    prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#>
+    SELECT ?s ?lat ?long WHERE { ?s loc:geometry ?g . ?g geo:lat ?lat . ?g geo:long ?long .
+    FILTER (51.03 < ?lat && ?lat < 51.05 && 3.65 < ?long && ?long <= 3.75) . }""",
+    """prefix loc: <http://www.w3.org/ns/locn#>
+    prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#>
+    SELECT ?s WHERE { ?s loc:geometry ?g . ?g geo:lat ?lat . ?g geo:long ?long . FILTER (?lat >= 50.9 && ?lat <= 51.1) }"""]
+
+
+class QueryOptimizerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TripleStore(max_rows=None)
+        cls.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        cls.plain = TripleStore(max_rows=None, optimize_queries=False)
+        cls.plain.get_graph('CreatingData/vkb_oslo_1000.ttl')
+
+    def test_same_results(self):
+        for query in QUERIES:
+            with self.subTest(query=query):
+                expected = self.plain.perform_sparql_query(query)
+                result = self.store.perform_sparql_query(query)
+                self.assertListEqual(expected['headers'], result['headers'])
+                self.assertListEqual(sorted(expected['data']), sorted(result['data']))
+
+    def test_equality_becomes_bound_pattern(self):
+        query = optimize_query(translateQuery(parseQuery(QUERIES[1])))
+        nodes = list(_walk(query.algebra))
+        triples = [triple for node in nodes if node.name == 'BGP' for triple in node.triples]
+        self.assertListEqual([(OPSTELLING, Variable('p'), Variable('o'))], triples)
+        self.assertIn((Variable('s'), OPSTELLING), [(node.var, node.expr) for node in nodes if node.name == 'Extend'])
+
+    def test_bounds_use_spatial_index(self):
+        query = optimize_query(translateQuery(parseQuery(QUERIES[3])), self.store.spatial_index)
+        values = [node for node in _walk(query.algebra) if node.name == 'values']
+        self.assertEqual(1, len(values))
+        candidates = {row[Variable('s')] for row in values[0].res}
+        self.assertLessEqual(set(self.store.spatial_index.query(51.03, 3.65, 51.05, 3.75)), candidates)
+        self.assertLessEqual(candidates, set(self.store.spatial_index.query(51.0299, 3.6499, 51.0501, 3.7501)))
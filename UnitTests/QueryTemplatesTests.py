@@ -0,0 +1,61 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from TripleAPI.QueryGuard import QueryLimits, LimitedGraph
+from TripleAPI.QueryTemplates import query_templates, TemplateBindingError, UnknownTemplateError
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI
+
+
+class QueryTemplatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        store = TripleStore()
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        cls.triple_api = TripleStoreAPI(store)
+
+    def test_wegsegment_template_matches_native_lookup(self):
+        native = set(self.triple_api.get_opstellingen_by_wegsegment(wegsegment_id='966119'))
+        sparql = set(self.triple_api.get_opstellingen_by_wegsegment_using_sparql(wegsegment_id='966119'))
+        self.assertGreater(len(native), 0)
+        self.assertSetEqual(native, sparql)
+
+    def test_bindings_are_not_concatenated_into_the_query(self):
+        result = self.triple_api.perform_template_query(
+            'opstellingen_by_wegsegment', {'segment': '966119> . ?x ?y ?z . <urn:x'})
+        self.assertListEqual([], result['data'])
+
+    def test_invalid_bindings(self):
+        with self.assertRaises(UnknownTemplateError):
+            self.triple_api.perform_template_query('no_such_template', {})
+        with self.assertRaises(TemplateBindingError):
+            self.triple_api.perform_template_query('opstellingen_by_wegsegment', {'subject': '966119'})
+        with self.assertRaises(TemplateBindingError):
+            self.triple_api.perform_template_query('opstellingen_by_bounds', {'lower_lat': 'north', 'lower_long': 3,
+                                                                              'upper_lat': 52, 'upper_long': 4})
+        with self.assertRaises(TemplateBindingError):
+            self.triple_api.perform_template_query('opstellingen_by_wegsegment', {})
+        for value in ['NaN', 'sNaN', 'Infinity', '-inf']:
+            with self.subTest(value=value):
+                with self.assertRaises(TemplateBindingError):
+                    self.triple_api.perform_template_query('opstellingen_by_bounds', {
+                        'lower_lat': value, 'lower_long': 1, 'upper_lat': 2, 'upper_long': 3})
+
+    def test_wegsegment_template_starts_from_the_segment(self):
+        template = query_templates.get('opstellingen_by_wegsegment')
+        limits = QueryLimits()
+        graph = LimitedGraph(self.triple_api.store.get_state().graph, limits)
+        rows = list(graph.query(template.prepared, initBindings=template.bind({'segment': '966119'})))
+        self.assertGreater(len(rows), 0)
+        # only the hoortBij triples of the segment are read, not every opstelling
+        self.assertEqual(len(rows), limits.touched)
+
+    def test_bounds_by_sparql_is_one_query(self):
+        bounds = (50.8, 3.6, 51.0, 3.8)
+        native = set(self.triple_api.get_opstellingen_by_bounds(*bounds))
+        self.assertGreater(len(native), 0)
+        self.assertSetEqual(native, set(self.triple_api.get_opstellingen_by_bounds_by_sparql(*bounds)))
+        store = self.triple_api.store
+        with patch.object(store, 'perform_prepared_query', wraps=store.perform_prepared_query) as perform:
+            list(self.triple_api.get_opstellingen_by_bounds_by_sparql(*bounds))
+        self.assertEqual(1, perform.call_count)
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from TripleAPI.ResponseCache import ResponseCache, etag_matches
+from TripleAPI.TripleStore import TripleStore
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.store = TripleStore()
+        self.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        self.rendered = []
+
+    def render(self, id: str, format: str) -> bytes:
+        self.rendered.append((id, format, self.store.version))
+        if id == 'unknown':
+            return None
+        return f'{id}.{format}'.encode()
+
+    def test_rendered_once_per_version(self):
+        cache = ResponseCache(self.store, self.render)
+        body, etag = cache.get(('1044565', 'ttl'))
+        self.assertEqual(b'1044565.ttl', body)
+        self.assertEqual((body, etag), cache.get(('1044565', 'ttl')))
+        self.assertEqual(1, len(self.rendered))
+
+        self.store.load('CreatingData/vkb_oslo_1000.ttl')
+        cache._warm_thread.join()
+        # the key that was cached before the load is rendered again for the new version
+        self.assertListEqual([('1044565', 'ttl', 1), ('1044565', 'ttl', 2)], self.rendered)
+        self.assertEqual((body, etag), cache.get(('1044565', 'ttl')))
+        self.assertEqual(2, len(self.rendered))
+
+    def test_nothing_to_render_is_not_cached(self):
+        cache = ResponseCache(self.store, self.render)
+        self.assertIsNone(cache.get(('unknown', 'ttl')))
+        self.assertIsNone(cache.get(('unknown', 'ttl')))
+        self.assertEqual(2, len(self.rendered))
+        self.assertEqual(0, len(cache.cache))
+
+    def test_warm_keys(self):
+        cache = ResponseCache(self.store, self.render, max_size=3,
+                              warm_keys=lambda store: ((str(i), 'nt') for i in range(10)))
+        cache.reload()
+        cache._warm_thread.join()
+        self.assertEqual(3, len(self.rendered))
+        self.assertEqual(3, len(cache.cache))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a", W/"b"', '"b"'))
+        self.assertTrue(etag_matches('*', '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
@@ -0,0 +1,84 @@
+import io
+import tracemalloc
+from unittest import TestCase
+
+from rdflib import Literal, XSD
+from rdflib.query import Result
+
+from TripleAPI.QueryGuard import QueryRejectedError
+from TripleAPI.SparqlResultsSerializer import SparqlResultsSerializer, UnsupportedResultsError
+from TripleAPI.TripleStore import TripleStore
+
+QUERY = '''prefix mob: <https://data.vlaanderen.be/ns/mobiliteit#>
+prefix loc: <http://www.w3.org/ns/locn#>
+prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#>
+SELECT ?s ?lat ?segment WHERE { ?s loc:geometry ?g . ?g geo:lat ?lat . OPTIONAL { ?s mob:hoortBij ?segment } }'''
+
+
+class SparqlResultsSerializerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TripleStore()
+        cls.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        cls.serializer = SparqlResultsSerializer()
+
+    def test_json_and_tsv_keep_the_datatypes(self):
+        variables, rows = self.store.stream_sparql_query(QUERY)
+        rows = list(rows)
+        for media_type, format in [('application/sparql-results+json', 'json'),
+                                   ('text/tab-separated-values', 'tsv')]:
+            chunks = self.serializer.serialize(media_type, variables, rows)
+            data = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks)
+            result = Result.parse(io.BytesIO(data), format=format)
+
+            self.assertListEqual(variables, [str(variable) for variable in result.vars])
+            self.assertEqual(len(rows), len(result))
+            self.assertSetEqual(set(rows), {tuple(row) for row in result})
+            self.assertEqual(XSD.decimal, next(iter(result))[1].datatype)
+
+    def test_csv(self):
+        rows = [(Literal('zone "30", behalve\nfietsers'), None)]
+        csv = ''.join(self.serializer.csv(['opschrift', 'segment'], rows))
+        self.assertEqual('opschrift,segment\r\n"zone ""30"", behalve\nfietsers",\r\n', csv)
+
+    def test_negotiate(self):
+        self.assertEqual('text/csv', self.serializer.negotiate('text/html;q=0.5, text/csv;q=0.9'))
+        self.assertIsNone(self.serializer.negotiate('application/json'))
+
+    def test_small_results_are_cached_once_streamed(self):
+        query = QUERY + ' LIMIT 5'
+        variables, rows = self.store.stream_sparql_query(query)
+        self.assertIsNone(self.store.query_cache.get((self.store.version, ('rows', query))))
+        rows = list(rows)
+        self.assertEqual((variables, rows), self.store.query_cache.get((self.store.version, ('rows', query))))
+
+    def test_ask(self):
+        query = 'prefix mob: <https://data.vlaanderen.be/ns/mobiliteit#> ASK { ?s mob:hoortBij ?segment }'
+        variables, answer = self.store.stream_sparql_query(query)
+        self.assertIsNone(variables)
+        data = self.serializer.boolean('application/sparql-results+json', answer)
+        self.assertEqual(b'{"head":{},"boolean":true}', data)
+        self.assertTrue(Result.parse(io.BytesIO(data), format='json').askAnswer)
+        with self.assertRaises(UnsupportedResultsError):
+            self.serializer.boolean('text/csv', answer)
+
+    def test_construct_is_rejected(self):
+        query = 'prefix mob: <https://data.vlaanderen.be/ns/mobiliteit#> ' \
+                'CONSTRUCT { ?s mob:hoortBij ?segment } WHERE { ?s mob:hoortBij ?segment }'
+        with self.assertRaises(QueryRejectedError):
+            self.store.stream_sparql_query(query)
+
+    def test_streaming_keeps_memory_flat(self):
+        store = TripleStore(cached_stream_rows=0)
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+
+        def peak(limit: int) -> int:
+            tracemalloc.start()
+            variables, rows = store.stream_sparql_query(f'SELECT ?s ?p ?o WHERE {{ ?s ?p ?o }} LIMIT {limit}')
+            count = sum(1 for _ in rows)
+            size = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.assertEqual(limit, count)
+            return size
+
+        self.assertLess(peak(20000), peak(1000) * 2)
@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+from rdflib import URIRef
+
+from TripleAPI.SpatialIndex import SpatialIndex
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI
+
+
+class SpatialIndexTests(TestCase):
+    def test_query_matches_full_scan(self):
+        points = [(51.0 + i * 0.001, 3.6 + (i * 7 % 100) * 0.002, URIRef(f'http://example.org/{i}')) for i in range(100)]
+        index = SpatialIndex(cell_size=0.01)
+        index.build(points)
+
+        result = set(index.query(lower_lat=51.02, lower_long=3.65, upper_lat=51.05, upper_long=3.75))
+        expected = {s for lat, long, s in points if 51.02 < lat < 51.05 and 3.65 < long < 3.75}
+        self.assertSetEqual(expected, result)
+        self.assertEqual(100, len(index))
+
+    def test_bounds_native_and_sparql_return_same_opstellingen(self):
+        store = TripleStore()
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        triple_api = TripleStoreAPI(store)
+
+        native = set(triple_api.get_opstellingen_by_bounds(lower_lat=51.03, lower_long=3.65, upper_lat=51.05,
+                                                           upper_long=3.75))
+        sparql = set(triple_api.get_opstellingen_by_bounds_by_sparql(lower_lat=51.03, lower_long=3.65,
+                                                                     upper_lat=51.05, upper_long=3.75))
+        self.assertGreater(len(native), 0)
+        self.assertSetEqual(native, sparql)
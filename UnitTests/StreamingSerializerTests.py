@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from rdflib import Graph, BNode, XSD, URIRef, Literal
+
+from TripleAPI.StreamingSerializer import StreamingSerializer
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI, NAMESPACES
+
+
+class StreamingSerializerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        store = TripleStore()
+        store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+        cls.triple_api = TripleStoreAPI(store)
+        cls.serializer = StreamingSerializer(dict(NAMESPACES, xsd=str(XSD)))
+
+    def assert_same_triples(self, expected: set, graph: Graph):
+        without_bnodes = lambda triples: {t for t in triples if not any(isinstance(term, BNode) for term in t)}
+        self.assertEqual(len(expected), len(graph))
+        self.assertSetEqual(without_bnodes(expected), without_bnodes(graph))
+
+    def test_turtle_and_ntriples_round_trip(self):
+        expected = set(self.triple_api.get_opstellingen_by_bounds(lower_lat=51.03, lower_long=3.65, upper_lat=51.05,
+                                                                  upper_long=3.75))
+        turtle = ''.join(self.serializer.turtle(iter(expected)))
+        self.assert_same_triples(expected, Graph().parse(data=turtle, format='turtle'))
+        self.assertIn('vkb:', turtle)
+
+        ntriples = ''.join(self.serializer.ntriples(iter(expected)))
+        self.assert_same_triples(expected, Graph().parse(data=ntriples, format='nt'))
+
+    def test_ndjson_lines_are_json_ld_node_objects(self):
+        expected = set(self.triple_api.get_full_opstelling_triples('1044565'))
+        lines = list(self.serializer.ndjson(self.triple_api.get_full_opstelling_triples('1044565')))
+
+        graph = Graph()
+        for line in lines:
+            graph.parse(data=line, format='json-ld')
+        self.assert_same_triples(expected, graph)
+        self.assertTrue(lines[0].startswith(b'{"@id":"https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/'
+                                            b'verkeersborden/1044565"'))
+
+    def test_jsonld_is_one_document(self):
+        expected = set(self.triple_api.get_opstellingen_batch(['1044565'], ['966119']))
+        jsonld = b''.join(self.serializer.jsonld(iter(expected)))
+        self.assert_same_triples(expected, Graph().parse(data=jsonld, format='json-ld'))
+        self.assertEqual(b'{"@graph":[]}', b''.join(self.serializer.jsonld([])))
+
+    def test_literals_are_escaped(self):
+        triple = (URIRef('https://data.awvvlaanderen.be/id/asset/1_bord_1_teken'),
+                  URIRef('https://data.vlaanderen.be/ns/mobiliteit#variabelOpschrift'),
+                  Literal('zone "30"\\\nbehalve\r fietsers'))
+        for serialized, format in [(self.serializer.ntriples([triple]), 'nt'),
+                                   (self.serializer.turtle([triple]), 'turtle')]:
+            graph = Graph().parse(data=''.join(serialized), format=format)
+            self.assertSetEqual({triple}, set(graph))
@@ -0,0 +1,27 @@
+from unittest import TestCase
+
+from rdflib import Graph, URIRef, Literal
+
+from TripleAPI.GraphTraversal import GraphTraversal
+from TripleAPI.TraversalMetrics import TraversalMetrics
+
+EX = 'http://example.org/'
+
+
+class TraversalMetricsTests(TestCase):
+    def test_record(self):
+        graph = Graph()
+        for i in range(3):
+            graph.add((URIRef(EX + 'a'), URIRef(EX + 'value'), Literal(i)))
+        metrics = TraversalMetrics()
+        self.assertIsNone(metrics.stats()['touched_per_returned'])
+
+        complete = GraphTraversal(graph, [URIRef(EX + 'a')])
+        list(complete)
+        metrics.record(complete)
+        truncated = GraphTraversal(graph, [URIRef(EX + 'a')], max_triples=1)
+        list(truncated)
+        metrics.record(truncated)
+
+        self.assertDictEqual({'responses': 2, 'touched': 3 + truncated.touched, 'returned': 4, 'truncated': 1,
+                              'touched_per_returned': round((3 + truncated.touched) / 4, 3)}, metrics.stats())
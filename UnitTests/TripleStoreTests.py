@@ -48,6 +48,39 @@ class TripleStoreTests(TestCase):
         for triple in triple_api.get_opstellingen_by_wegsegment(wegsegment_id='665218'):
             print(triple)
 
+    def test_get_opstellingen_batch(self):
+        store = TripleStore()
+        store_source = 'CreatingData/vkb_oslo_1000.ttl'
+        store.get_graph(store_source)
+        triple_api = TripleStoreAPI(store)
+        single = set(triple_api.get_full_opstelling_triples('1044565'))
+        by_segment = set(triple_api.get_full_opstelling_triples('103868'))
+
+        triples = list(triple_api.get_opstellingen_batch(['1044565', '1044565', '103868'], ['966119']))
+        self.assertEqual(len(triples), len(set(triples)))
+        self.assertTrue(single | by_segment <= set(triples))
+
+    def test_reload_swaps_state(self):
+        store = TripleStore()
+        store_source = 'CreatingData/vkb_oslo_1000.ttl'
+        store.get_graph(store_source)
+        triple_api = TripleStoreAPI(store)
+        old_state = store.get_state()
+        triples = triple_api.get_full_opstelling_triples('1044565')
+
+        self.assertTrue(store.reload())
+        store._reload_thread.join()
+        self.assertEqual('loaded', store.reload_status['status'])
+        self.assertEqual(old_state.version + 1, store.version)
+        self.assertIsNot(old_state.graph, store.get_state().graph)
+        # a request that started before the swap finishes on the old graph
+        self.assertTrue(all(triple in old_state.graph for triple in triples))
+
+        self.assertTrue(store.reload('CreatingData/missing.ttl'))
+        store._reload_thread.join()
+        self.assertEqual('failed', store.reload_status['status'])
+        self.assertEqual(old_state.version + 1, store.version)
+
     def test_query_30k(self):
         store = TripleStore()
         store_source = 'CreatingData/vkb_oslo_30k.ttl'
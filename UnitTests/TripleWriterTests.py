@@ -0,0 +1,54 @@
+import io
+from unittest import TestCase
+
+from rdflib import Graph, URIRef, BNode, Literal, RDF, XSD
+
+from CreatingData.TripleWriter import NTriplesWriter, TurtleWriter
+
+EX = 'http://example.org/'
+
+
+class TripleWriterTests(TestCase):
+    def setUp(self):
+        blank_node = BNode()
+        self.triples = [
+            (URIRef(EX + 'a'), RDF.type, URIRef(EX + 'Thing')),
+            (URIRef(EX + 'a'), URIRef(EX + 'name'), Literal('a "quoted"\nname', lang='nl')),
+            (URIRef(EX + 'a'), URIRef(EX + 'point'), blank_node),
+            (blank_node, URIRef(EX + 'lat'), Literal('50.8', datatype=XSD.decimal)),
+            (URIRef('https://other.org/b'), URIRef(EX + 'code'), Literal('tab\there'))]
+
+    def parse(self, data: str, format: str) -> Graph:
+        graph = Graph()
+        graph.parse(data=data, format=format)
+        return graph
+
+    def assertSameGraph(self, graph: Graph):
+        expected = Graph()
+        for triple in self.triples:
+            expected.add(triple)
+        self.assertEqual(len(expected), len(graph))
+        self.assertSetEqual({t for t in expected if not isinstance(t[0], BNode) and not isinstance(t[2], BNode)},
+                            {t for t in graph if not isinstance(t[0], BNode) and not isinstance(t[2], BNode)})
+
+    def test_ntriples(self):
+        output = io.StringIO()
+        writer = NTriplesWriter(output)
+        for triple in self.triples:
+            writer.add(triple)
+        writer.close()
+        self.assertEqual(5, writer.count)
+        self.assertEqual(5, len(output.getvalue().splitlines()))
+        self.assertSameGraph(self.parse(output.getvalue(), 'nt'))
+
+    def test_turtle_groups_subjects(self):
+        output = io.StringIO()
+        writer = TurtleWriter(output, {'ex': EX})
+        writer.write_prefixes()
+        for triple in self.triples:
+            writer.add(triple)
+        writer.close()
+        data = output.getvalue()
+        self.assertIn('ex:a a ex:Thing ;\n    ex:name', data)
+        self.assertIn('<https://other.org/b> ex:code', data)
+        self.assertSameGraph(self.parse(data, 'turtle'))
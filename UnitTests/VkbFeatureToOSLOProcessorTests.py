@@ -0,0 +1,36 @@
+import os
+import random
+from pathlib import Path
+from unittest import TestCase
+
+from CreatingData.DataHelpers.VkbFeature import VkbFeature
+from CreatingData.VkbFeatureToOSLOProcessor import VkbFeatureToOSLOProcessor
+
+CREATING_DATA = Path(__file__).resolve().parent.parent / 'CreatingData'
+
+
+class VkbFeatureToOSLOProcessorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # the beheerders are read relative to CreatingData
+        cwd = os.getcwd()
+        os.chdir(CREATING_DATA)
+        try:
+            cls.processor = VkbFeatureToOSLOProcessor()
+        finally:
+            os.chdir(cwd)
+
+    def test_transform_coords_matches_transforming_every_point(self):
+        random.seed(1)
+        # lambert72 coordinates in and around Flanders, including the corners of the range
+        coords = [[22000.0, 153000.0], [258000.0, 244000.0], [104719.28, 194223.57]]
+        coords += [[random.uniform(22000, 258000), random.uniform(153000, 244000)] for _ in range(200)]
+        features = [VkbFeature(id=i, coords=xy) for i, xy in enumerate(coords)]
+
+        self.processor.transform_coords(features)
+        for feature in features:
+            self.assertEqual(self.processor.transformer.transform(feature.coords[0], feature.coords[1]),
+                             feature.wgs84_coords)
+
+    def test_transform_coords_of_an_empty_batch(self):
+        self.processor.transform_coords([])
@@ -0,0 +1,55 @@
+import io
+import json
+from unittest import TestCase
+
+from CreatingData.VkbJsonReader import VkbJsonReader, batched
+
+FEATURES = [{'type': 'Feature', 'properties': {'id': i, 'opschrift': 'zone "30" ]}, behalve' * (i % 3)},
+             'geometry': {'type': 'Point', 'coordinates': [104000.5 + i, 194000.25]}} for i in range(20)]
+
+
+class VkbJsonReaderTests(TestCase):
+    def read(self, text: str, buffer_size: int = 16) -> list:
+        return list(VkbJsonReader(buffer_size=buffer_size).read_array(io.StringIO(text)))
+
+    def test_features_split_across_buffers(self):
+        text = json.dumps(FEATURES, indent=2)
+        for buffer_size in [1, 7, 16, 100, len(text), 1 << 16]:
+            with self.subTest(buffer_size=buffer_size):
+                self.assertListEqual(FEATURES, self.read(text, buffer_size))
+
+    def test_values_that_end_with_the_buffer(self):
+        self.assertListEqual([1234, 5678], self.read('[1234, 5678]', buffer_size=3))
+
+    def test_empty_array(self):
+        self.assertListEqual([], self.read(' [ \n ] '))
+
+    def test_leading_whitespace_longer_than_the_buffer(self):
+        self.assertListEqual(FEATURES[:2], self.read(' \n' * 50 + json.dumps(FEATURES[:2]), buffer_size=8))
+
+    def test_trailing_comma(self):
+        for text in ['[{"id": 1},]', '[{"id": 1},\n\n\n\n\n\n    ]', '[,]']:
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, 'trailing comma|expected a feature'):
+                    self.read(text, buffer_size=4)
+        with self.assertRaisesRegex(ValueError, 'trailing comma'):
+            self.read('[{"id": 1},    ]', buffer_size=4)
+
+    def test_malformed_input(self):
+        cases = {'{"id": 1}': 'should be a json array',
+                 '': 'should be a json array',
+                 '   ': 'should be a json array',
+                 '[{"id": 1} {"id": 2}]': 'expected , or ]',
+                 '[{"id": 1}, {"id": }]': 'not valid json',
+                 '[{"id": 1}, {"id": 2': 'ends in the middle of the array',
+                 '[{"id": 1}': 'ends in the middle of the array'}
+        for text, message in cases.items():
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ValueError, message):
+                    self.read(text, buffer_size=4)
+
+    def test_read_lines_and_batches(self):
+        text = '\n'.join(json.dumps(feature) for feature in FEATURES[:5]) + '\n\n'
+        features = list(VkbJsonReader.read_lines(io.StringIO(text)))
+        self.assertListEqual(FEATURES[:5], features)
+        self.assertListEqual([FEATURES[:2], FEATURES[2:4], FEATURES[4:5]], list(batched(features, 2)))
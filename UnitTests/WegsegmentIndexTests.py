@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from rdflib import URIRef
+
+from TripleAPI.TripleStore import TripleStore
+from TripleAPI.TripleStoreAPI import TripleStoreAPI
+from TripleAPI.WegsegmentIndex import WegsegmentIndex, HOORT_BIJ, WEGSEGMENT
+
+VKB = 'https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/'
+
+
+class WegsegmentIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TripleStore()
+        cls.graph = cls.store.get_graph('CreatingData/vkb_oslo_1000.ttl')
+
+    def test_index_matches_graph(self):
+        index = self.store.wegsegment_index
+        segments = set(self.graph.objects(predicate=HOORT_BIJ))
+        self.assertEqual(len(segments), len(index))
+        for segment in segments:
+            self.assertSetEqual(set(self.graph.subjects(predicate=HOORT_BIJ, object=segment)),
+                                set(index.get(str(segment)[len(WEGSEGMENT):])))
+
+    def test_range_and_duplicates(self):
+        index = WegsegmentIndex()
+        index.build([(URIRef(VKB + '1'), '10'), (URIRef(VKB + '2'), '10'), (URIRef(VKB + '2'), '12'),
+                     (URIRef(VKB + '3'), '200'), (URIRef(VKB + '4'), 'x')])
+        self.assertListEqual(['10', '12'], index.range(10, 199))
+        self.assertListEqual(['200'], index.range(200, 200))
+        self.assertListEqual([URIRef(VKB + '1'), URIRef(VKB + '2')], list(index.opstellingen(['10', '12', '10'])))
+        self.assertListEqual([URIRef(VKB + '4')], list(index.opstellingen(['x'])))
+        self.assertSetEqual({'10', '12', '200', 'x'}, set(index))
+
+    def test_multiple_wegsegmenten(self):
+        api = TripleStoreAPI(self.store)
+        single = set(api.get_opstellingen_by_wegsegment('966119'))
+        triples = list(api.get_opstellingen_by_wegsegmenten(['966119', '966119'], [(966119, 966119)]))
+        self.assertEqual(len(triples), len(set(triples)))
+        self.assertSetEqual(single, set(triples))
+        self.assertGreater(len(single), 0)
@@ -0,0 +1,205 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import psutil
+from rdflib import Graph, URIRef, BNode, Literal, XSD
+
+from CreatingData.TripleWriter import NTriplesWriter
+from TripleAPI.SpatialIndex import LAT, LONG
+from TripleAPI.TripleStore import TripleStore
+
+VKB = 'https://apps.mow.vlaanderen.be/verkeersborden/rest/zi/verkeersborden/'
+ASSET = 'https://data.awvvlaanderen.be/id/asset/'
+WR = 'https://www.vlaanderen.be/digitaal-vlaanderen/onze-oplossingen/wegenregister/'
+# the ids of copy k are shifted by k * ID_OFFSET, so every copy has its own opstellingen, borden and wegsegmenten
+ID_OFFSET = 100000000
+SOURCE = 'CreatingData/vkb_oslo_1000.ttl'
+DATASETS = {'1000': 1, '30k': 30, '300k': 300}
+FORMATS = ['ttl', 'nt', 'ndjson', 'json']
+
+
+def scale_dataset(source, copies: int, output_path, seed: int = 1) -> None:
+    # copies of the 1000 opstellingen with shifted ids and their coordinates moved by up to 0.01 degrees
+    graph = Graph()
+    graph.parse(source, format='turtle')
+    random.seed(seed)
+    with open(output_path, 'w', encoding='utf-8') as output:
+        writer = NTriplesWriter(output)
+        for copy in range(copies):
+            offset = (random.uniform(-0.01, 0.01), random.uniform(-0.01, 0.01)) if copy > 0 else (0.0, 0.0)
+            for s, p, o in graph:
+                writer.add((shift_term(s, copy), p, shift_coordinate(p, shift_term(o, copy), offset)))
+        writer.close()
+
+
+def shift_term(term, copy: int):
+    if copy == 0:
+        return term
+    if isinstance(term, BNode):
+        return BNode(f'{term}x{copy}')
+    if not isinstance(term, URIRef):
+        return term
+    for namespace in (VKB, WR, ASSET):
+        if term.startswith(namespace):
+            id, _, rest = term[len(namespace):].partition('_')
+            if id.isdigit():
+                return URIRef(f'{namespace}{int(id) + copy * ID_OFFSET}{"_" if rest else ""}{rest}')
+    return term
+
+
+def shift_coordinate(predicate, term, offset: tuple):
+    if predicate == LAT:
+        return Literal(float(term) + offset[0], datatype=XSD.decimal)
+    if predicate == LONG:
+        return Literal(float(term) + offset[1], datatype=XSD.decimal)
+    return term
+
+
+def dataset_path(dataset: str, data_dir: Path) -> str:
+    copies = DATASETS[dataset]
+    if copies == 1:
+        return SOURCE
+    path = data_dir / f'vkb_oslo_{dataset}.nt'
+    if not path.is_file():
+        start = time.perf_counter()
+        scale_dataset(SOURCE, copies, path)
+        print(f'generated {path} in {round(time.perf_counter() - start, 2)} seconds')
+    return str(path)
+
+
+def percentiles(durations: [float]) -> dict:
+    # durations in seconds, the result in milliseconds
+    cuts = statistics.quantiles(durations, n=100, method='inclusive') if len(durations) > 1 else durations * 99
+    return {'count': len(durations), 'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+            'p50_ms': round(cuts[49] * 1000, 3), 'p95_ms': round(cuts[94] * 1000, 3),
+            'p99_ms': round(cuts[98] * 1000, 3), 'max_ms': round(max(durations) * 1000, 3),
+            'throughput_per_s': round(len(durations) / sum(durations), 1)}
+
+
+def measure(requests: [tuple], call) -> dict:
+    # call(*request) has to return the complete response, so streamed bodies are read before the clock stops
+    durations, size = [], 0
+    for request in requests:
+        start = time.perf_counter()
+        response = call(*request)
+        durations.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f'{request} returned {response.status_code}: {response.text[:200]}')
+        size += len(response.content)
+    return dict(percentiles(durations), bytes=size)
+
+
+def benchmark_load(source: str) -> dict:
+    process = psutil.Process(os.getpid())
+    results = {}
+    gc.collect()
+    before = process.memory_info().rss
+    start = time.perf_counter()
+    store = TripleStore(use_snapshot=False)
+    store.get_graph(source)
+    results['parse_and_index_s'] = round(time.perf_counter() - start, 3)
+    results['rss_mb'] = round((process.memory_info().rss - before) / 1024 ** 2, 1)
+    results['triples'] = len(store.get_state().graph)
+    results['opstellingen'] = len(store.opstelling_index)
+    del store
+    gc.collect()
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        TripleStore(snapshot_dir=snapshot_dir).get_graph(source)
+        gc.collect()
+        start = time.perf_counter()
+        TripleStore(snapshot_dir=snapshot_dir).get_graph(source)
+        results['snapshot_and_index_s'] = round(time.perf_counter() - start, 3)
+    gc.collect()
+    return results
+
+
+def benchmark_api(source: str, count: int, seed: int = 1) -> dict:
+    # the endpoints are called through the FastAPI app, like a client would
+    os.environ['TRIPLESTORE_SOURCE'] = source
+    from starlette.testclient import TestClient
+    import main
+
+    client = TestClient(main.app)
+    state = main.store.get_state()
+    random.seed(seed)
+    ids = [str(opstelling)[len(VKB):] for opstelling in random.choices(list(state.opstelling_index), k=count)]
+    segments = random.choices(list(state.wegsegment_index), k=count)
+    boxes = []
+    for opstelling in random.choices(list(state.opstelling_index), k=count):
+        geometry = state.graph.value(opstelling, URIRef('http://www.w3.org/ns/locn#geometry'))
+        lat, long = float(state.graph.value(geometry, LAT)), float(state.graph.value(geometry, LONG))
+        boxes.append({'lower_lat': lat - 0.01, 'lower_long': long - 0.01, 'upper_lat': lat + 0.01,
+                      'upper_long': long + 0.01})
+
+    def get(url: str, params: dict = None, headers: dict = None):
+        return client.get(url, params=params, headers=headers)
+
+    results = {}
+    main.opstelling_responses.cache.clear()
+    results['opstelling_by_id_cold'] = measure([(f'/opstelling/{id}',) for id in ids], get)
+    results['opstelling_by_id_cached'] = measure([(f'/opstelling/{id}',) for id in ids], get)
+    results['bounds_native'] = measure([('/opstelling/bounds', dict(box, format='nt')) for box in boxes], get)
+    results['bounds_sparql'] = measure([('/opstelling/bounds_sparql', dict(box, format='nt')) for box in boxes], get)
+    results['wegsegment_native'] = measure(
+        [('/opstelling/wegsegment', {'wegsegment_id': segment, 'format': 'nt'}) for segment in segments], get)
+    # the same N-Triples response, only the opstellingen are looked up with the SPARQL template
+    main.store.query_cache.clear()
+    results['wegsegment_sparql'] = measure(
+        [('/opstelling/wegsegment_sparql', {'wegsegment_id': segment, 'format': 'nt'}) for segment in segments], get)
+    for format in FORMATS:
+        results[f'bounds_format_{format}'] = measure([('/opstelling/bounds', dict(box, format=format))
+                                                      for box in boxes], get)
+    return results
+
+
+def git_commit() -> dict:
+    def git(*args) -> str:
+        return subprocess.run(['git', *args], capture_output=True, text=True).stdout.strip()
+    return {'commit': git('rev-parse', '--short', 'HEAD'), 'dirty': git('status', '--porcelain', '--untracked-files=no') != ''}
+
+
+def run(dataset: str, count: int, data_dir: Path, results_dir: Path) -> Path:
+    data_dir.mkdir(parents=True, exist_ok=True)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    source = dataset_path(dataset, data_dir)
+    report = dict(git_commit(), dataset=dataset, source=source, requests=count,
+                  timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), python=platform.python_version(),
+                  cpu_count=os.cpu_count())
+    report['load'] = benchmark_load(source)
+    report['api'] = benchmark_api(source, count)
+
+    path = results_dir / f'{report["commit"]}-{dataset}.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f'written {path}')
+    return path
+
+
+def print_report(report: dict) -> None:
+    print(f'{report["dataset"]} at {report["commit"]}{" (dirty)" if report["dirty"] else ""}: {report["load"]}')
+    print(f'{"endpoint":<28} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>9}')
+    for name, result in report['api'].items():
+        print(f'{name:<28} {result["p50_ms"]:>9} {result["p95_ms"]:>9} {result["p99_ms"]:>9} '
+              f'{result["throughput_per_s"]:>9}')
+
+
+if __name__ == '__main__':
+    # python benchmark.py --dataset 30k, the results are written to benchmark_results/<commit>-<dataset>.json
+    parser = argparse.ArgumentParser(description='benchmark the triple store and the API')
+    parser.add_argument('--dataset', choices=list(DATASETS), default='1000')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--data-dir', type=Path, default=Path('benchmark_data'))
+    parser.add_argument('--results-dir', type=Path, default=Path('benchmark_results'))
+    args = parser.parse_args()
+    run(args.dataset, args.requests, args.data_dir, args.results_dir)
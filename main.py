@@ -1,20 +1,34 @@
+import asyncio
+import hmac
 import json
 import time
 import os, psutil
 from enum import Enum
+from pathlib import Path
+from typing import List
 
 import pyparsing
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import ORJSONResponse
-from rdflib import URIRef
+from pydantic import BaseModel
+from rdflib import URIRef, XSD
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
-from starlette.responses import HTMLResponse, Response
+from starlette.responses import HTMLResponse, Response, StreamingResponse
 
+from TripleAPI.GraphTraversal import GraphTraversal
+from TripleAPI.GraphWorkPool import GraphWorkPool, PoolSaturatedError
 from TripleAPI.HtmlTemplates.HTMLTemplater import HTMLTemplater
 from TripleAPI.HtmlTemplates import VisualizeD3
+from TripleAPI.JsonLdEncoder import JsonLdEncoder
+from TripleAPI.QueryGuard import QueryRejectedError, QueryRowLimitError, QueryTimeoutError
+from TripleAPI.QueryTemplates import query_templates, TemplateBindingError, UnknownTemplateError
+from TripleAPI.ResponseCache import ResponseCache, etag_matches
+from TripleAPI.SparqlResultsSerializer import SparqlResultsSerializer, UnsupportedResultsError
+from TripleAPI.StreamingSerializer import StreamingSerializer
+from TripleAPI.TraversalMetrics import TraversalMetrics
 from TripleAPI.TripleStore import TripleStore
-from TripleAPI.TripleStoreAPI import TripleStoreAPI
+from TripleAPI.TripleStoreAPI import TripleStoreAPI, NAMESPACES
 
 app = FastAPI()
 
@@ -30,14 +44,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-store = TripleStore()
-store_source = 'CreatingData/vkb_oslo_30k.ttl'
+# SPARQL_STREAM_TIMEOUT is the time a streamed /sparql result may take to evaluate and serialize, the time the client
+# takes to read it does not count. the default leaves room for the 1000000 rows a stream may have
+store = TripleStore(backend=os.environ.get('TRIPLESTORE_BACKEND', 'memory'),
+                    query_timeout=float(os.environ.get('SPARQL_TIMEOUT', 20.0)),
+                    max_rows=int(os.environ.get('SPARQL_MAX_ROWS', 10000)),
+                    stream_timeout=float(os.environ.get('SPARQL_STREAM_TIMEOUT', 120.0)))
+store_source = os.environ.get('TRIPLESTORE_SOURCE', 'CreatingData/vkb_oslo_30k.ttl')
 api_start = time.time()
 store.get_graph(store_source)
 api_end = time.time()
 api_time_spent = round(api_end - api_start, 2)
 print(f'Time to load db: {api_time_spent}')
-triple_store_api = TripleStoreAPI(store)
+triple_store_api = TripleStoreAPI(store, max_depth=int(os.environ.get('TRAVERSAL_MAX_DEPTH', 8)),
+                                  max_triples=int(os.environ.get('TRAVERSAL_MAX_TRIPLES', 1000000)))
+sparql_results_serializer = SparqlResultsSerializer()
+# graph work runs on this pool, so a slow query does not block the other requests on the event loop
+graph_pool = GraphWorkPool(max_workers=int(os.environ.get('GRAPH_POOL_WORKERS', 4)),
+                           max_queue=int(os.environ.get('GRAPH_POOL_QUEUE', 16)),
+                           timeout=float(os.environ.get('GRAPH_POOL_TIMEOUT', 30.0)))
+# the triples touched and returned by the traversals of the /opstelling endpoints, see /metrics
+traversal_metrics = TraversalMetrics()
+
+
+async def run_on_pool(fn, *args):
+    try:
+        return await graph_pool.run(fn, *args)
+    except PoolSaturatedError as exc:
+        print('503')
+        raise HTTPException(status_code=503, detail=str(exc))
+    except asyncio.TimeoutError:
+        print('504')
+        raise HTTPException(status_code=504, detail='The request took too long')
+
+
+def stream_on_pool(body, timeout: float = None):
+    try:
+        return graph_pool.stream(body, timeout=timeout)
+    except PoolSaturatedError as exc:
+        print('503')
+        raise HTTPException(status_code=503, detail=str(exc))
 
 
 @app.get("/")
@@ -46,15 +92,46 @@ async def root():
 
 
 @app.get("/sparql", response_class=Response)
-async def sparql(request: Request, query: str = ''):
+async def sparql(request: Request, query: str = '', template: str = ''):
     if 'text/html' in request.headers['accept']:
         with open('TripleAPI/HtmlTemplates/HtmlSparql.html', 'r+') as f:
             html_str = f.read()
         return html_str
     else:
         encoder = json.encoder.JSONEncoder()
+        # every other query parameter is a binding for the template, e.g. ?template=...&segment=966119
+        bindings = {k: v for k, v in request.query_params.items() if k not in ('query', 'template')}
+        media_type = sparql_results_serializer.negotiate(request.headers['accept'])
         try:
-            result = encoder.encode(o=triple_store_api.perform_sparql_query(query))
+            if media_type is not None:
+                # the standard results formats are streamed while rdflib returns the rows
+                if template != '':
+                    variables, rows = await run_on_pool(triple_store_api.stream_template_query, template, bindings)
+                else:
+                    variables, rows = await run_on_pool(triple_store_api.stream_sparql_query, query)
+                if variables is None:
+                    result = Response(sparql_results_serializer.boolean(media_type, rows), media_type=media_type)
+                else:
+                    body = stream_on_pool(sparql_results_serializer.serialize(media_type, variables, rows),
+                                          timeout=store.stream_timeout)
+                    result = StreamingResponse(body, media_type=media_type)
+            elif template != '':
+                result = encoder.encode(o=await run_on_pool(triple_store_api.perform_template_query, template,
+                                                            bindings))
+            else:
+                result = encoder.encode(o=await run_on_pool(triple_store_api.perform_sparql_query, query))
+        except UnknownTemplateError as exc:
+            print('404')
+            raise HTTPException(status_code=404, detail=exc.args[0])
+        except (QueryRejectedError, TemplateBindingError, UnsupportedResultsError) as exc:
+            print('400')
+            raise HTTPException(status_code=400, detail=str(exc))
+        except QueryRowLimitError as exc:
+            print('413')
+            raise HTTPException(status_code=413, detail=str(exc))
+        except QueryTimeoutError as exc:
+            print('504')
+            raise HTTPException(status_code=504, detail=str(exc))
         except PermissionError:
             print('403')
             raise HTTPException(status_code=403, detail="Not allowed to run this query")
@@ -65,11 +142,130 @@ async def sparql(request: Request, query: str = ''):
         return result
 
 
+# POST /admin/reload needs the X-Admin-Token header, without ADMIN_TOKEN the admin endpoints are disabled
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+
+def check_admin_token(request: Request) -> None:
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail='Set ADMIN_TOKEN to use the admin endpoints')
+    if not hmac.compare_digest(request.headers.get('x-admin-token', ''), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail='Not allowed')
+
+
+@app.post("/admin/reload", status_code=202)
+async def reload_store(request: Request, source: str = ''):
+    # the new graph and its indexes are built in the background, requests keep using the current graph until the swap
+    # source is the name of a file next to the current source, without it the current source is loaded again
+    check_admin_token(request)
+    if source != '':
+        path = Path(store._source).parent / Path(source).name
+        if not path.is_file():
+            raise HTTPException(status_code=404, detail=f'{path.name} does not exist')
+        source = str(path)
+    if not store.reload(source or None):
+        raise HTTPException(status_code=409, detail='A reload is still running')
+    return ORJSONResponse(dict(store.reload_status, version=store.version), status_code=202)
+
+
+@app.get("/admin/reload")
+async def reload_status(request: Request):
+    check_admin_token(request)
+    return ORJSONResponse(dict(store.reload_status, version=store.version, source=str(store._source)))
+
+
+@app.get("/sparql/cache")
+async def sparql_cache():
+    return ORJSONResponse(store.query_cache.stats())
+
+
+@app.get("/metrics")
+async def metrics():
+    return ORJSONResponse({'store': {'version': store.version, 'reload': store.reload_status['status']},
+                           'graph_pool': graph_pool.stats(), 'query_cache': store.query_cache.stats(),
+                           'opstelling_responses': opstelling_responses.stats(),
+                           'traversals': traversal_metrics.stats()})
+
+
+@app.get("/sparql/templates")
+async def sparql_templates():
+    return ORJSONResponse([{'name': t.name, 'parameters': list(t.parameters), 'query': t.query}
+                           for t in query_templates])
+
+
 class Format(str, Enum):
     ttl = 'ttl'
     turtle = 'turtle'
+    nt = 'nt'
     json = 'json'
     jsonld = 'jsonld'
+    ndjson = 'ndjson'
+
+
+streaming_serializer = StreamingSerializer(dict(NAMESPACES, xsd=str(XSD)))
+json_ld_encoder = JsonLdEncoder(dict(NAMESPACES, xsd=str(XSD)))
+
+
+MEDIA_TYPES = {Format.ttl: 'text/turtle', Format.turtle: 'text/turtle', Format.nt: 'application/n-triples',
+               Format.json: 'application/ld+json', Format.jsonld: 'application/ld+json',
+               Format.ndjson: 'application/x-ndjson'}
+CANONICAL_FORMATS = {Format.turtle: Format.ttl, Format.jsonld: Format.json}
+
+
+def stream_triples(triples, format: Format):
+    if format in [Format.ttl, Format.turtle]:
+        return streaming_serializer.turtle(triples)
+    elif format == Format.nt:
+        return streaming_serializer.ntriples(triples)
+    return streaming_serializer.ndjson(triples)
+
+
+async def create_response(triples: GraphTraversal, format: Format) -> Response:
+    # the streamed formats are written while the triples are generated, json-ld is framed so it needs every triple
+    # the triples are generated and serialized on the graph pool
+    if format in [Format.json, Format.jsonld]:
+        content = await run_on_pool(json_ld_encoder.encode, triples)
+        traversal_metrics.record(triples)
+        return Response(content, media_type=MEDIA_TYPES[format],
+                        headers={'X-Triples-Touched': str(triples.touched),
+                                 'X-Traversal-Truncated': str(triples.truncated).lower()})
+    return StreamingResponse(stream_on_pool(report_touched(stream_triples(triples, format), triples)),
+                             media_type=MEDIA_TYPES[format])
+
+
+def report_touched(chunks, triples: GraphTraversal):
+    # the headers of a streamed response are sent before the triples are known, so these are counted in the
+    # traversal metrics and logged at the end, also when the response is cut off
+    try:
+        yield from chunks
+    finally:
+        traversal_metrics.record(triples)
+        truncated = ' (truncated)' if triples.truncated else ''
+        print(f'touched {triples.touched} triples, returned {triples.yielded}{truncated}')
+
+
+def render_opstelling(id: str, format: str) -> bytes:
+    # None for an id without triples, so an unknown id is a 404 that is not cached
+    triples = list(triple_store_api.get_full_opstelling_triples(id))
+    if len(triples) == 0:
+        return None
+    if format == Format.json:
+        return json_ld_encoder.encode(triples)
+    return b''.join(chunk.encode() if isinstance(chunk, str) else chunk
+                    for chunk in stream_triples(triples, Format(format)))
+
+
+def opstelling_warm_keys(store: TripleStore):
+    # OPSTELLING_CACHE_WARM_FORMATS=ttl,json renders every opstelling in those formats after a load
+    formats = [Format(f).value for f in os.environ.get('OPSTELLING_CACHE_WARM_FORMATS', '').split(',') if f != '']
+    prefix = len(NAMESPACES['vkb'])
+    return ((str(opstelling)[prefix:], format) for opstelling in store.opstelling_index for format in formats)
+
+
+# the rendered /opstelling/{id} responses, keyed on (id, format) for the loaded version of the graph
+opstelling_responses = ResponseCache(store, render_opstelling, warm_keys=opstelling_warm_keys,
+                                     max_size=int(os.environ.get('OPSTELLING_CACHE_SIZE', 4096)))
+opstelling_responses.reload()
 
 
 @app.get("/opstelling/wegsegment", response_class=Response)
@@ -80,14 +276,7 @@ async def get_opstelling_by_wegsegment(wegsegment_id: str, format: Format = Form
     time_spent = round(end - start, 3)
     print(f'Time to process query: {time_spent}')
 
-    h = await triple_store_api.create_graph_from_triples(triples)
-
-    if format in [Format.json, Format.jsonld]:
-        json_content = h.serialize(format='json-ld')
-        return ORJSONResponse(json.loads(json_content))
-    elif format in [Format.ttl, Format.turtle]:
-        ttl_content = h.serialize(format='turtle')
-        return Response(ttl_content)
+    return await create_response(triples, format)
 
 
 @app.get("/opstelling/bounds", response_class=Response)
@@ -99,14 +288,7 @@ async def get_opstelling_by_bounds(lower_lat: float, lower_long: float, upper_la
     time_spent = round(end - start, 3)
     print(f'Time to process query: {time_spent}')
 
-    h = await triple_store_api.create_graph_from_triples(triples)
-
-    if format in [Format.json, Format.jsonld]:
-        json_content = h.serialize(format='json-ld')
-        return ORJSONResponse(json.loads(json_content))
-    elif format in [Format.ttl, Format.turtle]:
-        ttl_content = h.serialize(format='turtle')
-        return Response(ttl_content)
+    return await create_response(triples, format)
 
 
 @app.get("/opstelling/bounds_sparql", response_class=Response)
@@ -118,14 +300,105 @@ async def get_opstelling_by_bounds_sparql(lower_lat: float, lower_long: float, u
     time_spent = round(end - start, 3)
     print(f'Time to process query: {time_spent}')
 
-    h = await triple_store_api.create_graph_from_triples(triples)
+    return await create_response(triples, format)
+
+
+@app.get("/opstelling/wegsegment_sparql", response_class=Response)
+async def get_opstelling_by_wegsegment_sparql(wegsegment_id: str, format: Format = Format.ttl):
+    # the same response as /opstelling/wegsegment, the opstellingen are looked up with the SPARQL template
+    start = time.time()
+    triples = triple_store_api.get_opstellingen_by_wegsegment_using_sparql(wegsegment_id)
+    end = time.time()
+    time_spent = round(end - start, 3)
+    print(f'Time to process query: {time_spent}')
+
+    return await create_response(triples, format)
+
+
+class OpstellingBatch(BaseModel):
+    ids: List[str] = []
+    wegsegment_ids: List[str] = []
+
+
+MAX_BATCH_SIZE = int(os.environ.get('OPSTELLING_MAX_BATCH_SIZE', 10000))
 
+
+@app.post("/opstelling/batch", response_class=Response)
+async def get_opstellingen_batch(batch: OpstellingBatch, format: Format = Format.ttl):
+    if len(batch.ids) + len(batch.wegsegment_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f'A batch can hold at most {MAX_BATCH_SIZE} ids')
+    triples = triple_store_api.get_opstellingen_batch(batch.ids, batch.wegsegment_ids)
+    return stream_response(triples, format)
+
+
+def stream_response(triples: GraphTraversal, format: Format) -> StreamingResponse:
+    # the json-ld of many opstellingen is streamed as one expanded document instead of being framed
     if format in [Format.json, Format.jsonld]:
-        json_content = h.serialize(format='json-ld')
-        return ORJSONResponse(json.loads(json_content))
-    elif format in [Format.ttl, Format.turtle]:
-        ttl_content = h.serialize(format='turtle')
-        return Response(ttl_content)
+        body = streaming_serializer.jsonld(triples)
+    else:
+        body = stream_triples(triples, format)
+    return StreamingResponse(stream_on_pool(report_touched(body, triples)), media_type=MEDIA_TYPES[format])
+
+
+def parse_wegsegment_ids(text: str) -> ([str], [(int, int)]):
+    # 966119,966120,1000-2000: single ids and ranges of ids, a range includes both ends
+    ids, ranges = [], []
+    for part in text.split(','):
+        part = part.strip()
+        if part == '':
+            continue
+        if '-' in part:
+            lower, upper = part.split('-', 1)
+            ranges.append((int(lower), int(upper)))
+        else:
+            ids.append(part)
+    return ids, ranges
+
+
+@app.get("/opstelling/wegsegmenten", response_class=Response)
+async def get_opstellingen_by_wegsegmenten(ids: str, format: Format = Format.ttl):
+    try:
+        wegsegment_ids, ranges = parse_wegsegment_ids(ids)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'ids should be wegsegment ids or ranges like 1000-2000: {ids}')
+    if len(wegsegment_ids) + len(ranges) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f'A request can hold at most {MAX_BATCH_SIZE} ids')
+    triples = triple_store_api.get_opstellingen_by_wegsegmenten(wegsegment_ids, ranges)
+    return stream_response(triples, format)
+
+
+def bounds_filter(lower_lat: float, lower_long: float, upper_lat: float, upper_long: float) -> tuple:
+    bounds = (lower_lat, lower_long, upper_lat, upper_long)
+    if all(value is None for value in bounds):
+        return None
+    if any(value is None for value in bounds):
+        raise HTTPException(status_code=400, detail='Give lower_lat, lower_long, upper_lat and upper_long together')
+    return bounds
+
+
+@app.get("/opstelling/borden", response_class=Response)
+async def get_opstellingen_by_borden(code: str = None, beheerder: str = None, lower_lat: float = None,
+                                     lower_long: float = None, upper_lat: float = None, upper_long: float = None,
+                                     format: Format = Format.ttl):
+    # the opstellingen with a bord with this code and/or beheerder (the OVO code), optionally within the bounds
+    bounds = bounds_filter(lower_lat, lower_long, upper_lat, upper_long)
+    try:
+        triples = triple_store_api.get_opstellingen_by_borden(code=code, beheerder=beheerder, bounds=bounds)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return stream_response(triples, format)
+
+
+@app.get("/bord", response_class=Response)
+async def get_borden(code: str = None, beheerder: str = None, lower_lat: float = None, lower_long: float = None,
+                     upper_lat: float = None, upper_long: float = None, format: Format = Format.ttl):
+    # e.g. /bord?code=C43&beheerder=OVO002949 for every C43 sign of that beheerder
+    bounds = bounds_filter(lower_lat, lower_long, upper_lat, upper_long)
+    try:
+        triples = triple_store_api.get_borden(code=code, beheerder=beheerder, bounds=bounds)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return stream_response(triples, format)
 
 
 @app.get("/opstelling/{id}", response_class=Response)
@@ -143,14 +416,15 @@ async def get_opstelling_by_id(request: Request, format: Format = Format.ttl, id
 
         return HTMLResponse(content=html_page)
     else:
-        h = await triple_store_api.create_graph_from_triples(triples)
-
-        if format in [Format.json, Format.jsonld]:
-            json_content = h.serialize(format='json-ld')
-            return ORJSONResponse(json.loads(json_content))
-        elif format in [Format.ttl, Format.turtle]:
-            ttl_content = h.serialize(format='turtle')
-            return Response(ttl_content)
+        # a single opstelling is a dictionary lookup, it stays off the graph pool
+        rendered = opstelling_responses.get((id, CANONICAL_FORMATS.get(format, format).value))
+        if rendered is None:
+            print('404')
+            raise HTTPException(status_code=404, detail=f'there is no opstelling with id {id}')
+        body, etag = rendered
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers={'ETag': etag})
+        return Response(body, media_type=MEDIA_TYPES[format], headers={'ETag': etag})
 
 
 @app.get("/opstelling/{asset_id}/visualize", response_class=HTMLResponse)
@@ -199,6 +473,9 @@ process = psutil.Process(os.getpid())
 print(f'using {process.memory_info().rss / 1024 ** 2} MB of memory')  # in Mbytes
 
 # uvicorn main:app --reload
+# TRIPLESTORE_BACKEND=shared uvicorn main:app --workers 4  (workers map one shared snapshot of the graph)
+# ADMIN_TOKEN=... uvicorn main:app, then curl -X POST -H 'X-Admin-Token: ...' http://127.0.0.1:8000/admin/reload
+#   (with several workers every worker reloads on its own, so send the reload to each of them)
 
 # https://fastapi.tiangolo.com/tutorial/first-steps/
 